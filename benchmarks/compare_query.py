@@ -0,0 +1,96 @@
+"""Time the compare reports of two runs, and the runs of one test, in a large database.
+
+    python benchmarks/compare_query.py --runs 10 --envs 10 --cases 20000
+
+Run it again with ``--drop-indexes`` to see what the indexes are worth.
+"""
+import itertools
+import pathlib
+import tempfile
+import time
+
+import click
+from satests_insert import database
+from satests_insert import make_result
+
+import checkon.app
+import checkon.satests
+
+
+TEST_RUNS_QUERY = """
+SELECT tr.tox_run_id, tr.provider, ter.envname, fo.message
+FROM test_case tc
+JOIN test_case_run tcr ON tcr.test_case_id = tc.test_case_id
+JOIN toxenv_run ter ON ter.test_suite_run_id = tcr.test_suite_run_id
+JOIN tox_run tr ON tr.tox_run_id = ter.tox_run_id
+LEFT JOIN test_failure tf ON tf.test_failure_id = tcr.test_failure_id
+LEFT JOIN failure_output fo ON fo.failure_output_id = tf.failure_output_id
+WHERE tc.name = 'test_100' AND tc.classname = 'tests.test_mod0.TestClass'
+"""
+
+
+def measure(db, name, query, **params):
+    print(f"{name}:")
+    for row in db.engine.execute(query("EXPLAIN QUERY PLAN "), **params):
+        print(f"    {row[-1]}")
+    start = time.perf_counter()
+    rows = checkon.satests.stream_rows(db, query(""), **params)
+    count = sum(1 for _ in itertools.islice(rows, 1))
+    first = time.perf_counter() - start
+    count += sum(1 for _ in rows)
+    print(
+        f"    {count} rows in {time.perf_counter() - start:.2f}s,"
+        f" the first in {first:.2f}s"
+    )
+
+
+@click.command()
+@click.option("--runs", default=10, help="Runs of one dependent to insert.")
+@click.option("--envs", default=10)
+@click.option("--cases", default=20000, help="Test cases per env.")
+@click.option("--fail-every", default=20, help="On base; new fails twice as often.")
+@click.option("--drop-indexes", is_flag=True)
+def main(runs, envs, cases, fail_every, drop_indexes):
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database(pathlib.Path(tmp) / "bench.db")
+        base = make_result(envs, cases, fail_every)
+        new = make_result(envs, cases, fail_every // 2)
+        start = time.perf_counter()
+        for _ in range(runs):
+            base_tox_run_id = checkon.satests.insert_result(db, base)
+            tox_run_id = checkon.satests.insert_result(db, new)
+        print(
+            f"inserted {2 * runs * envs * cases} test case runs"
+            f" in {time.perf_counter() - start:.1f}s"
+        )
+        if drop_indexes:
+            for [name] in db.engine.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'"
+            ).fetchall():
+                db.engine.execute(f"DROP INDEX {name}")
+
+        measure(
+            db,
+            "compare report",
+            checkon.app.report_query,
+            tox_run_ids=[base_tox_run_id, tox_run_id],
+        )
+        measure(
+            db,
+            "failures",
+            checkon.app.report_query,
+            tox_run_ids=[base_tox_run_id, tox_run_id],
+            hide_passed=True,
+        )
+        measure(
+            db,
+            "changes",
+            checkon.app.changes_report_query,
+            base_tox_run_ids=[base_tox_run_id],
+            new_tox_run_ids=[tox_run_id],
+        )
+        measure(db, "runs of one test", lambda prefix: prefix + TEST_RUNS_QUERY)
+
+
+if __name__ == "__main__":
+    main()
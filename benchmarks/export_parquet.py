@@ -0,0 +1,62 @@
+"""Time exporting a large database to Parquet, in full and then incrementally.
+
+    python benchmarks/export_parquet.py --runs 10 --envs 10 --cases 20000
+
+Needs pyarrow. For comparison, it also times loading as many test case runs as
+one run has through the ORM.
+"""
+import pathlib
+import tempfile
+import time
+
+import click
+from satests_insert import database
+from satests_insert import make_result
+
+import checkon.export
+import checkon.satests
+
+
+def timed_export(db, output_dir, name):
+    start = time.perf_counter()
+    tox_runs, rows = checkon.export.export(db, output_dir)
+    seconds = time.perf_counter() - start
+    print(
+        f"{name}: {rows} test case runs of {tox_runs} tox runs in {seconds:.1f}s,"
+        f" {rows / seconds:,.0f} rows/s"
+    )
+
+
+@click.command()
+@click.option("--runs", default=10)
+@click.option("--envs", default=10)
+@click.option("--cases", default=20000, help="Test cases per env.")
+@click.option("--fail-every", default=20)
+def main(runs, envs, cases, fail_every):
+    result = make_result(envs, cases, fail_every)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database(pathlib.Path(tmp) / "bench.db")
+        for _ in range(runs):
+            checkon.satests.insert_result(db, result)
+        output_dir = pathlib.Path(tmp) / "export"
+
+        timed_export(db, output_dir, "full")
+        checkon.satests.insert_result(db, result)
+        timed_export(db, output_dir, "incremental")
+
+        start = time.perf_counter()
+        rows = db.session.query(checkon.satests.TestCaseRun).limit(envs * cases).all()
+        for row in rows:
+            # What the export has of each run, loaded lazily.
+            row.test_case.name, row.test_suite_run.envname
+            if row.test_failure is not None:
+                row.test_failure.failure_output.message
+        seconds = time.perf_counter() - start
+        print(
+            f"orm: {len(rows)} test case runs in {seconds:.1f}s,"
+            f" {len(rows) / seconds:,.0f} rows/s"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Measure the database size and insert time of runs that repeat their failures.
+
+    python benchmarks/failure_output_size.py --runs 20 --envs 6 --cases 5000
+
+Every run fails the same tests with the same tracebacks, as nightly runs of a
+broken dependent do.
+"""
+import pathlib
+import tempfile
+import time
+
+import click
+from satests_insert import database
+from satests_insert import make_result
+
+import checkon.satests
+
+
+def traceback_text(i: int) -> str:
+    site_packages = "/home/ci/project/.tox/py37/lib/python3.7/site-packages"
+    frames = "".join(
+        f'  File "{site_packages}/pkg/mod{n}.py", line {10 * n + i % 7}, in call_{n}\n'
+        f"    return call_{n + 1}(value, **options)\n"
+        for n in range(20)
+    )
+    return (
+        "Traceback (most recent call last):\n"
+        + frames
+        + f"AssertionError: assert {i} == 0\n"
+    )
+
+
+def database_size(db, path: pathlib.Path) -> int:
+    db.engine.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return path.stat().st_size
+
+
+@click.command()
+@click.option("--runs", default=20, help="Runs of one dependent to insert.")
+@click.option("--envs", default=6)
+@click.option("--cases", default=5000, help="Test cases per env.")
+@click.option("--fail-every", default=5)
+def main(runs, envs, cases, fail_every):
+    result = make_result(envs, cases, fail_every, failure_text=traceback_text)
+    failures = runs * envs * (cases // fail_every)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp) / "failures.db"
+        db = database(path)
+        start = time.perf_counter()
+        for _ in range(runs):
+            checkon.satests.insert_result(db, result)
+        seconds = time.perf_counter() - start
+        size = database_size(db, path)
+    print(
+        f"{failures} failures: inserted in {seconds:.1f}s,"
+        f" {size / 2 ** 20:.1f} MB, {size / failures:.0f} bytes per failure"
+    )
+
+
+if __name__ == "__main__":
+    main()
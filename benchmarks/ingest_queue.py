@@ -0,0 +1,75 @@
+"""Measure how long workers wait on inserting results, inline or through the ingester.
+
+    python benchmarks/ingest_queue.py --jobs 8 --runs 4 --envs 4 --cases 20000
+
+Each worker "tests" for ``--test-seconds`` before each of its runs. Inline, the
+workers insert one at a time, since the bulk loader allows only one writer.
+"""
+import concurrent.futures
+import pathlib
+import tempfile
+import threading
+import time
+
+import click
+from satests_insert import database
+from satests_insert import make_result
+
+import checkon.ingest
+import checkon.satests
+
+
+def work(runs, test_seconds, insert):
+    waited = 0.0
+    for run in runs:
+        time.sleep(test_seconds)
+        start = time.perf_counter()
+        insert(run)
+        waited += time.perf_counter() - start
+    return waited
+
+
+def measure(name, jobs, url_to_runs, test_seconds, insert, finish=lambda: None):
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        waited = list(
+            executor.map(
+                lambda runs: work(runs, test_seconds, insert), url_to_runs.values()
+            )
+        )
+    finish()
+    print(
+        f"{name}: {time.perf_counter() - start:.1f}s wall,"
+        f" workers waited {sum(waited):.1f}s in all, {max(waited):.1f}s at most"
+    )
+
+
+@click.command()
+@click.option("--jobs", default=8)
+@click.option("--runs", default=4, help="Runs per worker.")
+@click.option("--envs", default=4)
+@click.option("--cases", default=20000, help="Test cases per env.")
+@click.option("--test-seconds", default=1.0)
+def main(jobs, runs, envs, cases, test_seconds):
+    # Each worker's runs are the same result, one object per run.
+    url_to_runs = {
+        worker: [make_result(envs, cases, 20) for _ in range(runs)]
+        for worker in range(jobs)
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database(pathlib.Path(tmp) / "inline.db")
+        lock = threading.Lock()
+
+        def insert(run):
+            with lock:
+                checkon.satests.insert_result(db, run)
+
+        measure("inline", jobs, url_to_runs, test_seconds, insert)
+
+        db = database(pathlib.Path(tmp) / "ingest.db")
+        ingester = checkon.ingest.Ingester(db)
+        measure("ingest", jobs, url_to_runs, test_seconds, ingester.put, ingester.close)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Compare the time and peak memory of the ways checkon loads JUnit XML.
+
+    python benchmarks/junit_loading.py --cases 50000 --output-size 2000
+"""
+import pathlib
+import tempfile
+import time
+import tracemalloc
+import xml.sax.saxutils
+
+import click
+
+import checkon.results
+
+
+def write_junit(path: pathlib.Path, cases: int, output_size: int, fail_every: int):
+    output = xml.sax.saxutils.escape("x" * (output_size - 1) + "\n")
+    with open(path, "w") as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?><testsuites>')
+        f.write(
+            f'<testsuite errors="0" failures="{cases // fail_every}" skipped="0"'
+            f' tests="{cases}" time="1.0" timestamp="2019-09-11T22:33:25.000000"'
+            ' hostname="bench" name="pytest">'
+        )
+        for i in range(cases):
+            f.write(
+                f'<testcase classname="tests.test_mod{i % 100}.TestClass"'
+                f' file="tests/test_mod{i % 100}.py" line="{i}" name="test_{i}"'
+                ' time="0.001">'
+            )
+            if i % fail_every == 0:
+                f.write(f'<failure message="assert {i} == 0">{output}</failure>')
+            f.write("</testcase>")
+        f.write("</testsuite></testsuites>")
+
+
+def measure(name, load):
+    tracemalloc.start()
+    start = time.perf_counter()
+    count = load()
+    seconds = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<20} {count:>8} cases {seconds:8.2f}s {peak / 2 ** 20:10.1f} MB peak")
+
+
+@click.command()
+@click.option("--cases", default=50000)
+@click.option("--output-size", default=2000, help="Bytes of output per failure.")
+@click.option("--fail-every", default=10)
+def main(cases, output_size, fail_every):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp) / "env" / "test_env.xml"
+        path.parent.mkdir()
+        write_junit(path, cases, output_size, fail_every)
+        print(f"{path.stat().st_size / 2 ** 20:.1f} MB of JUnit XML")
+
+        measure(
+            "from_bytes",
+            lambda: sum(
+                len(suite.test_cases)
+                for suite in checkon.results.TestSuiteRun.from_bytes(
+                    path.read_bytes(), envname="env"
+                )
+            ),
+        )
+        measure(
+            "from_path",
+            lambda: sum(
+                len(suite.test_cases)
+                for suite in checkon.results.TestSuiteRun.from_path(path)
+            ),
+        )
+        measure(
+            "iter_test_cases",
+            lambda: sum(1 for _ in checkon.results.iter_test_cases(str(path))),
+        )
+
+
+if __name__ == "__main__":
+    main()
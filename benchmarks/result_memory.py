@@ -0,0 +1,43 @@
+"""Measure the memory held by loaded test results with tracemalloc.
+
+    python benchmarks/result_memory.py --dependents 30 --envs 6 --cases 2000
+"""
+import pathlib
+import tempfile
+import tracemalloc
+
+import click
+from junit_loading import write_junit
+
+import checkon.results
+
+
+@click.command()
+@click.option("--dependents", default=30)
+@click.option("--envs", default=6)
+@click.option("--cases", default=2000, help="Test cases per env.")
+@click.option("--output-size", default=2000, help="Bytes of output per failure.")
+@click.option("--fail-every", default=20)
+def main(dependents, envs, cases, output_size, fail_every):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = pathlib.Path(tmp) / "env" / "test_env.xml"
+        path.parent.mkdir()
+        write_junit(path, cases, output_size, fail_every)
+
+        tracemalloc.start()
+        suites = [
+            checkon.results.TestSuiteRun.from_path(path)
+            for _ in range(dependents * envs)
+        ]
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    total = sum(len(suite.test_cases) for [suite] in suites)
+    print(
+        f"{total} cases: {current / 2 ** 20:.1f} MB held,"
+        f" {peak / 2 ** 20:.1f} MB peak, {current / total:.0f} bytes per case"
+    )
+
+
+if __name__ == "__main__":
+    main()
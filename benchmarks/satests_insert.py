@@ -0,0 +1,114 @@
+"""Measure how fast results are inserted into a satests database, in rows per second.
+
+    python benchmarks/satests_insert.py --envs 50 --cases 20000 --orm-cases 20000
+
+The bulk loader inserts ``envs * cases`` test case runs; the ORM, for comparison,
+inserts ``orm-cases`` of them.
+"""
+import contextlib
+import datetime
+import io
+import pathlib
+import tempfile
+import time
+
+import click
+import sqlalchemy as sa
+
+import checkon.results
+import checkon.satests
+
+
+def make_result(
+    envs: int, cases: int, fail_every: int, failure_text=lambda i: "x" * 2000 + "\n"
+) -> checkon.results.AppSuiteRun:
+    timestamp = datetime.datetime(2019, 9, 11, 22, 33, 25)
+    suite_runs = []
+    for env in range(envs):
+        test_cases = [
+            checkon.results.TestCaseRun(
+                name=f"test_{i}",
+                classname=f"tests.test_mod{i % 100}.TestClass",
+                file=f"tests/test_mod{i % 100}.py",
+                line=i,
+                time=0.001,
+                failure=(
+                    checkon.results.Failure(
+                        message=f"assert {i} == 0", text=failure_text(i)
+                    )
+                    if i % fail_every == 0
+                    else None
+                ),
+            )
+            for i in range(cases)
+        ]
+        suite = checkon.results.TestSuiteRun(
+            errors=0,
+            failures=cases // fail_every,
+            skipped=0,
+            tests=cases,
+            time="1.0",
+            timestamp=timestamp,
+            hostname="bench",
+            name="pytest",
+            test_cases=test_cases,
+            envname=f"env{env}",
+        )
+        suite_runs.append(
+            checkon.results.ToxTestSuiteRun(
+                suite=suite, tox_run=None, envname=f"env{env}"
+            )
+        )
+    return checkon.results.AppSuiteRun(
+        injected="provider==1.0",
+        dependent_result=checkon.results.DependentResult(
+            url="https://example.com/dependent", suite_runs=suite_runs
+        ),
+    )
+
+
+def database(path: pathlib.Path) -> checkon.satests.Database:
+    db = checkon.satests.Database.from_string(f"sqlite:///{path}")
+    db.init()
+    return db
+
+
+@click.command()
+@click.option("--envs", default=50)
+@click.option("--cases", default=20000, help="Test cases per env.")
+@click.option("--fail-every", default=20)
+@click.option("--orm-cases", default=20000, help="Test cases to insert with the ORM.")
+@click.option("--batch-size", default=checkon.satests.BATCH_SIZE)
+def main(envs, cases, fail_every, orm_cases, batch_size):
+    result = make_result(envs, cases, fail_every)
+    with tempfile.TemporaryDirectory() as tmp:
+        db = database(pathlib.Path(tmp) / "bulk.db")
+        start = time.perf_counter()
+        checkon.satests.insert_result(db, result, batch_size=batch_size)
+        seconds = time.perf_counter() - start
+        rows = sum(
+            db.engine.execute(sa.select([sa.func.count()]).select_from(table)).scalar()
+            for table in checkon.satests.Base.metadata.sorted_tables
+        )
+        print(
+            f"bulk: {envs * cases} test case runs, {rows} rows in {seconds:.1f}s,"
+            f" {rows / seconds:,.0f} rows/s, {envs * cases / seconds:,.0f} runs/s"
+        )
+
+        if orm_cases:
+            small = make_result(1, orm_cases, fail_every)
+            db = database(pathlib.Path(tmp) / "orm.db")
+            start = time.perf_counter()
+            # The ORM transform prints what it inserts.
+            with contextlib.redirect_stdout(io.StringIO()):
+                db.session.add(db.transform(small))
+                db.session.commit()
+            seconds = time.perf_counter() - start
+            print(
+                f"orm:  {orm_cases} test case runs in {seconds:.1f}s,"
+                f" {orm_cases / seconds:,.0f} runs/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
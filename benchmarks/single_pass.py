@@ -0,0 +1,46 @@
+"""Compare the wall time of testing dependents with and without ``--single-pass``.
+
+    python benchmarks/single_pass.py --inject attrs==19.1.0 --repeat 3 DEPENDENT...
+
+A first run snapshots the dependents' envs, so the engines are timed on the
+inject and test steps only.
+"""
+import contextlib
+import io
+import statistics
+import time
+
+import click
+
+import checkon.app
+
+
+def timed_run(urls, inject, single_pass):
+    start = time.perf_counter()
+    # Each dependent prints its tox timings.
+    with contextlib.redirect_stdout(io.StringIO()):
+        checkon.app.run_many(urls, inject, single_pass=single_pass)
+    return time.perf_counter() - start
+
+
+@click.command()
+@click.argument("urls", nargs=-1, required=True)
+@click.option("--inject", required=True)
+@click.option("--repeat", default=3)
+def main(urls, inject, repeat):
+    timed_run(urls, inject, single_pass=False)
+    seconds = {False: [], True: []}
+    for _ in range(repeat):
+        for single_pass in seconds:
+            seconds[single_pass].append(timed_run(urls, inject, single_pass))
+    subprocesses, single = [statistics.median(seconds[key]) for key in [False, True]]
+    print(f"subprocess per env: {subprocesses:.1f}s")
+    print(f"single pass:        {single:.1f}s")
+    print(
+        f"saved {subprocesses - single:.1f}s,"
+        f" {(subprocesses - single) / subprocesses:.0%}"
+    )
+
+
+if __name__ == "__main__":
+    main()
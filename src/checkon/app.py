@@ -1,5 +1,7 @@
+import concurrent.futures
 import contextlib
 import fnmatch
+import json
 import os
 import pathlib
 import shlex
@@ -8,6 +10,7 @@ import subprocess
 import sys
 import tempfile
 import textwrap
+import time
 import typing as t
 
 import attr
@@ -16,9 +19,17 @@ import pkg_resources
 import pyrsistent
 import requests
 import requirements
-
+import sqlalchemy as sa
+
+from . import envcache
+from . import ingest
+from . import journal
+from . import limits
+from . import live
+from . import mirrors
 from . import results
 from . import satests
+from . import wheelhouse
 
 
 @attr.dataclass(frozen=True)
@@ -98,124 +109,679 @@ def resolve_inject(inject):
     return inject
 
 
-def run_one(project_url, inject: str):
-    print(project_url)
+@contextlib.contextmanager
+def output_streams(results_dir: pathlib.Path, capture: bool):
+    """Keyword arguments for `subprocess.run`, sending output to logs if ``capture``.
+
+    Concurrent dependents would otherwise interleave their output on the terminal, so
+    each one gets its own ``stdout.log`` and ``stderr.log`` in its results directory.
+    """
+    if not capture:
+        yield {}
+        return
+    with open(results_dir / "stdout.log", "ab") as stdout, open(
+        results_dir / "stderr.log", "ab"
+    ) as stderr:
+        yield {"stdout": stdout, "stderr": stderr}
+
 
-    results_dir = pathlib.Path(tempfile.TemporaryDirectory().name)
-    results_dir.mkdir(exist_ok=True, parents=True)
+PYTEST_PLUGIN_DIR = pathlib.Path(__file__).parent / "scripts" / "pytest_plugins"
 
-    clone_tempdir = pathlib.Path(tempfile.TemporaryDirectory().name)
-    subprocess.run(["git", "clone", str(project_url), str(clone_tempdir)], check=True)
-    rev_hash = (
-        subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=clone_tempdir)
-        .decode()
-        .strip()
-    )
+
+@attr.dataclass(frozen=True)
+class RunOptions:
+    """How to run each dependent."""
+
+    env_jobs: int = 1
+    single_pass: bool = False
+    capture_output: bool = False
+    run_journal: t.Optional[journal.Journal] = None
+    env_limits: limits.Limits = limits.Limits()
+    follow: bool = False
+    max_failures: t.Optional[int] = None
+    run_budget: t.Optional[live.FailureBudget] = None
+    ingester: t.Optional[ingest.Ingester] = None
+
+
+@attr.dataclass(frozen=True)
+class PreparedDependent:
+    """A dependent checked out, with its envs built and snapshotted."""
+
+    url: str
+    rev_hash: str
+    project_dir: pathlib.Path
+    envnames: t.Optional[t.List[str]]
+    snapshot_id: str
+    # The envs are as just snapshotted, so there is nothing to restore.
+    snapshot_fresh: bool = False
+
+
+def run_one(
+    project_url,
+    inject: str,
+    options: RunOptions = RunOptions(),
+    wheels: t.Optional[wheelhouse.Wheelhouse] = None,
+) -> results.AppSuiteRun:
+    if wheels is None:
+        with wheelhouse.Wheelhouse.temporary(inject) as wheels:
+            return run_one(project_url, inject, options, wheels)
+
+    [run] = run_dependent(project_url, [wheels], options)
+    return run
+
+
+def run_dependent(
+    project_url,
+    variants: t.Sequence[wheelhouse.Wheelhouse],
+    options: RunOptions = RunOptions(),
+    select: t.Optional[t.Dict[str, t.Optional[t.List[str]]]] = None,
+) -> t.List[results.AppSuiteRun]:
+    """Prepare a dependent once, then test it with each of the ``variants`` in turn.
+
+    With ``select``, only the toxenvs in it are run, and only the tests with the
+    pytest node ids it maps them to, unless that is None. When following, each
+    variant is aborted after ``options.max_failures`` failures. Each run is put to
+    ``options.ingester``, if any, as soon as it finishes.
+    """
+    prepared = None
+    runs = []
+    for wheels in variants:
+        results_dir = pathlib.Path(tempfile.TemporaryDirectory().name)
+        results_dir.mkdir(exist_ok=True, parents=True)
+
+        if options.capture_output:
+            print(f"{project_url} output in {results_dir}")
+        else:
+            print(project_url)
+
+        follower = None
+        if options.follow:
+            follower = live.Follower(
+                project_url,
+                results_dir,
+                live.FailureBudget(options.max_failures, parent=options.run_budget),
+            )
+
+        timings = []
+        start = time.monotonic()
+        with output_streams(results_dir, options.capture_output) as streams:
+            if prepared is None:
+                prepared = prepare(
+                    project_url,
+                    wheels,
+                    results_dir,
+                    streams,
+                    timings,
+                    list_envs=not options.single_pass,
+                )
+            envnames_run = test_variant(
+                prepared,
+                wheels,
+                results_dir,
+                streams,
+                timings,
+                options,
+                select,
+                follower,
+            )
+        # The next variant starts from envs this one injected into.
+        prepared = attr.evolve(prepared, snapshot_fresh=False)
+        report_timings(project_url, results_dir, timings, time.monotonic() - start)
+
+        run = results.AppSuiteRun(
+            injected=wheels.inject,
+            # Parsed as many toxenvs at a time as were run at a time.
+            dependent_result=results.DependentResult.from_dir(
+                output_dir=results_dir, url=project_url, jobs=options.env_jobs
+            ),
+        )
+        if options.ingester is not None:
+            ingest_run(
+                options.ingester,
+                # Partial runs from a `select` are left out of the journal.
+                None if select is not None else options.run_journal,
+                run,
+                prepared.rev_hash,
+                wheels.inject_digest,
+                replayed=not envnames_run,
+            )
+        runs.append(run)
+    return runs
+
+
+def ingest_run(
+    ingester: ingest.Ingester,
+    run_journal: t.Optional[journal.Journal],
+    run: results.AppSuiteRun,
+    rev: str,
+    inject: str,
+    replayed: bool,
+):
+    """Put ``run`` to ``ingester``, unless it was ``replayed`` and inserted already.
+
+    The id of each run inserted into a database file is kept in the run journal,
+    and a run whose envs all came from the journal keeps the id inserted then.
+    """
+    url = run.dependent_result.url
+    database = ingester.db.engine.url
+    if run_journal is None or database.database in (None, "", ":memory:"):
+        ingester.put(run)
+        return
+    database = str(database)
+    tox_run_id = run_journal.tox_run_id(url, rev, inject, database)
+    if replayed and tox_run_id is not None:
+        ingester.add_inserted(run, tox_run_id)
+        return
+
+    def record(future):
+        if future.exception() is None:
+            run_journal.record_tox_run_id(url, rev, inject, database, future.result())
+
+    ingester.put(run).add_done_callback(record)
+
+
+def prepare(
+    project_url,
+    wheels: wheelhouse.Wheelhouse,
+    results_dir: pathlib.Path,
+    streams,
+    timings: t.List[dict],
+    list_envs: bool = True,
+) -> PreparedDependent:
+    """Check out a dependent and snapshot its envs, unless its revision has them."""
+    mirror = mirrors.update(project_url, streams)
+    rev_hash = mirrors.head(mirror)
     project_tempdir = pathlib.Path("/tmp/checkon/" + str(rev_hash))
 
     if not project_tempdir.exists():
-        clone_tempdir.rename(project_tempdir)
+        mirrors.checkout(mirror, rev_hash, project_tempdir, streams)
 
+    # Envs snapshotted with another trial patch would report in another format.
+    snapshot_id = f"{rev_hash}-{wheels.trial_patch_digest[:16]}"
+    snapshot_fresh = not envcache.has_snapshots(snapshot_id)
+    if snapshot_fresh:
         # Create the envs and install deps.
-        subprocess.run(
+        run_tox(
             [
-                sys.executable,
-                "-m",
-                "tox",
                 "--notest",
                 "-c",
                 str(project_tempdir),
                 "--result-json",
                 str(results_dir / "tox_install.json"),
             ],
-            cwd=str(project_tempdir),
-            check=False,
+            project_tempdir,
+            timings,
+            **streams,
+        )
+
+        # Install the `trial` patch.
+        # TODO Put the original `trial` back afterwards.
+        run_tox(
+            ["--run-command", shell_join(wheels.trial_patch_command())],
+            project_tempdir,
+            timings,
+            **streams,
         )
 
-    # Install the `trial` patch.
-    # TODO Put the original `trial` back afterwards.
-    subprocess.run(
-        [
-            sys.executable,
-            "-m",
-            "tox",
-            "--run-command",
-            "python -m pip install checkon-trial",
-        ],
-        cwd=str(project_tempdir),
+        envcache.snapshot(snapshot_id, results_dir / "tox_install.json")
+
+    envnames = None
+    if list_envs:
+        envnames = (
+            run_tox(["-l"], project_tempdir, timings, capture_output=True, check=True)
+            .stdout.decode()
+            .splitlines()
+        )
+
+    return PreparedDependent(
+        url=project_url,
+        rev_hash=rev_hash,
+        project_dir=project_tempdir,
+        envnames=envnames,
+        snapshot_id=snapshot_id,
+        snapshot_fresh=snapshot_fresh,
     )
 
+
+def test_variant(
+    prepared: PreparedDependent,
+    wheels: wheelhouse.Wheelhouse,
+    results_dir: pathlib.Path,
+    streams,
+    timings: t.List[dict],
+    options: RunOptions = RunOptions(),
+    select: t.Optional[t.Dict[str, t.Optional[t.List[str]]]] = None,
+    follower: t.Optional[live.Follower] = None,
+) -> t.List[str]:
+    """Test a prepared dependent with the inject in ``wheels``.
+
+    Envs that the run journal has results for are copied over instead of run.
+    Partial runs from a ``select`` are left out of the journal. With a
+    ``follower``, failures are printed as they happen, and no more envs are started
+    once its budget is exhausted. Returns the names of the envs run.
+    """
+    if select is not None:
+        options = attr.evolve(options, run_journal=None)
+
+    completed = {}
+    if options.run_journal is not None:
+        completed = options.run_journal.completed(
+            prepared.url, prepared.rev_hash, wheels.inject_digest
+        )
+        journal.copy_results(completed, results_dir)
+
+    def record(envname):
+        if options.run_journal is not None:
+            options.run_journal.record(
+                prepared.url,
+                prepared.rev_hash,
+                envname,
+                wheels.inject_digest,
+                results_dir / envname,
+            )
+
+    if not options.single_pass:
+        envnames = [
+            envname
+            for envname in select_envnames(prepared.envnames)
+            if envname not in completed and (select is None or envname in select)
+        ]
+        if not envnames:
+            return []
+
+    # Start from the envs as they were before any injection. Envs snapshotted just
+    # now still are, and restoring them would copy every venv twice.
+    if not prepared.snapshot_fresh:
+        envcache.restore(prepared.snapshot_id)
+
     # TODO Install the `unittest` patch by adding a pth or PYTHONPATH replacing `unittest` on sys.path.
 
+    if options.single_pass:
+        envnames = run_single_pass(
+            prepared.project_dir,
+            results_dir,
+            wheels,
+            streams,
+            timings,
+            skip=list(completed),
+            select=select,
+            env_limits=options.env_limits,
+            follower=follower,
+        )
+        for envname in envnames:
+            record(envname)
+        return envnames
+
     # Install the injection into each venv
-    subprocess.run(
-        [
-            sys.executable,
-            "-m",
-            "tox",
-            "--run-command",
-            "python -m pip install --force " + shlex.quote(str(inject)),
-        ],
-        cwd=str(project_tempdir),
+    run_tox(
+        ["--run-command", shell_join(wheels.inject_command())],
+        prepared.project_dir,
+        timings,
+        **streams,
     )
 
-    # Get environment names.
-    envnames = (
-        subprocess.run(
-            [sys.executable, "-m", "tox", "-l"],
-            cwd=str(project_tempdir),
-            capture_output=True,
-            check=True,
+    def run_and_record(envname):
+        if follower is not None and follower.exhausted:
+            print(f"{prepared.url}: skipping {envname}, out of failure budget")
+            return
+        process = run_toxenv(
+            project_dir=prepared.project_dir,
+            results_dir=results_dir,
+            envname=envname,
+            streams=streams,
+            timings=timings,
+            capture_output=options.env_jobs > 1,
+            node_ids=None if select is None else select[envname],
+            env_limits=options.env_limits,
+            follower=follower,
+        )
+        # A negative return code means tox was killed before finishing.
+        if process.returncode >= 0:
+            record(envname)
+
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=options.env_jobs
+    ) as executor:
+        futures = [executor.submit(run_and_record, envname) for envname in envnames]
+    for future in futures:
+        future.result()
+    return envnames
+
+
+def run_tox(
+    args: t.List[str],
+    project_dir: pathlib.Path,
+    timings: t.List[dict],
+    env_limits: t.Optional[limits.Limits] = None,
+    usage_path: t.Optional[pathlib.Path] = None,
+    follower: t.Optional[live.Follower] = None,
+    **kw,
+):
+    """Run tox in ``project_dir``, recording how long it took in ``timings``.
+
+    With ``env_limits``, tox is killed once it exceeds them, or once the budget of
+    the ``follower`` is exhausted, and what it used is written to ``usage_path``.
+    """
+    start = time.monotonic()
+    try:
+        if env_limits is None:
+            kw.setdefault("check", False)
+            return subprocess.run(
+                [sys.executable, "-m", "tox", *args], cwd=str(project_dir), **kw
+            )
+
+        process, usage = limits.run(
+            [sys.executable, "-m", "tox", *args],
+            env_limits,
+            abort=follower,
+            cwd=str(project_dir),
+            **kw,
         )
-        .stdout.decode()
-        .splitlines()
+        if follower is not None:
+            # Catch the failures since the last poll.
+            follower.poll()
+        usage.write(usage_path)
+        if usage.killed is not None:
+            print(
+                f"{project_dir}: killed tox {shell_join(args)}"
+                f" for exceeding its {usage.killed} limit"
+            )
+        return process
+    finally:
+        timings.append({"args": args, "seconds": time.monotonic() - start})
+
+
+def report_timings(project_url, results_dir: pathlib.Path, timings, wall: float):
+    """Write the tox timings of a dependent to ``timings.json`` and summarize them.
+
+    The per-invocation times show what tox startup costs each engine, so the
+    subprocess and single-pass engines can be compared on the same dependent.
+    """
+    total = sum(timing["seconds"] for timing in timings)
+    (results_dir / "timings.json").write_text(
+        json.dumps({"wall": wall, "tox": timings}, indent=2)
+    )
+    print(
+        f"{project_url}: {len(timings)} tox invocations took {total:.1f}s,"
+        f" {wall:.1f}s wall time"
     )
-    toxenvs = [env for env in os.environ.get("TOXENV", "").split(",") if env]
-    for envname in envnames:
 
-        if toxenvs and not any(fnmatch.fnmatch(envname, f"*{e}*") for e in toxenvs):
-            continue
 
-        # Run the environment.
-        output_dir = results_dir / envname
-        output_dir.mkdir(exist_ok=True, parents=True)
-        test_output_file = output_dir / f"test_{envname}.xml"
-        tox_output_file = output_dir / f"tox_{envname}.json"
-        subprocess.run(
-            [
-                sys.executable,
-                "-m",
-                "tox",
-                "--result-json",
-                str(tox_output_file),
-                "-e",
-                envname,
-            ],
-            cwd=str(project_tempdir),
-            check=False,
-            env={
-                "TOX_TESTENV_PASSENV": "PYTEST_ADDOPTS",
-                "PYTEST_ADDOPTS": f"--tb=long --junitxml={test_output_file}",
-                "JUNITXML_PATH": test_output_file,
-                **os.environ,
-            },
+def shell_join(command: t.List[str]) -> str:
+    return " ".join(map(shlex.quote, command))
+
+
+def select_envnames(
+    envnames: t.List[str], patterns: t.Optional[str] = None
+) -> t.List[str]:
+    """Keep the envs matching one of the comma-separated ``patterns``.
+
+    The patterns default to ``$TOXENV``; with none, all envs are kept.
+    """
+    if patterns is None:
+        patterns = os.environ.get("TOXENV", "")
+    toxenvs = [env for env in patterns.split(",") if env]
+    return [
+        envname
+        for envname in envnames
+        if not toxenvs or any(fnmatch.fnmatch(envname, f"*{e}*") for e in toxenvs)
+    ]
+
+
+def junit_addopts(test_output_file: pathlib.Path) -> str:
+    """pytest options to write a junit report with full tracebacks.
+
+    It is xunit1, pytest's default before 6.0, which gives each test's file and line.
+    """
+    return f"--tb=long --junitxml={test_output_file} -o junit_family=xunit1"
+
+
+def run_toxenv(
+    project_dir: pathlib.Path,
+    results_dir: pathlib.Path,
+    envname: str,
+    streams,
+    timings: t.List[dict],
+    capture_output: bool = False,
+    node_ids: t.Optional[t.List[str]] = None,
+    env_limits: limits.Limits = limits.Limits(),
+    follower: t.Optional[live.Follower] = None,
+):
+    """Run the tests of one toxenv, writing its results into ``results_dir / envname``.
+
+    With ``capture_output``, the env's output goes to log files in its own results
+    directory so that envs running side by side don't interleave. With ``node_ids``,
+    pytest runs only those tests. The env is killed once it exceeds ``env_limits``
+    or the ``follower``'s budget, and what it used is written to
+    ``usage_{envname}.json``.
+    """
+    output_dir = results_dir / envname
+    output_dir.mkdir(exist_ok=True, parents=True)
+    test_output_file = output_dir / f"test_{envname}.xml"
+    tox_output_file = output_dir / f"tox_{envname}.json"
+    env = {
+        "TOX_TESTENV_PASSENV": "PYTEST_ADDOPTS",
+        "PYTEST_ADDOPTS": junit_addopts(test_output_file),
+        "JUNITXML_PATH": str(test_output_file),
+        **os.environ,
+    }
+    plugin_env, plugin_addopts = pytest_plugins(
+        output_dir, node_ids, follow=follower is not None
+    )
+    if plugin_env:
+        env = {
+            **env,
+            **plugin_env,
+            "TOX_TESTENV_PASSENV": " ".join(["PYTEST_ADDOPTS", *plugin_env]),
+            "PYTEST_ADDOPTS": f"{env['PYTEST_ADDOPTS']} {plugin_addopts}",
+            # tox itself may need the caller's path to find its plugins.
+            "PYTHONPATH": os.pathsep.join(
+                filter(None, [plugin_env["PYTHONPATH"], env.get("PYTHONPATH")])
+            ),
+        }
+    with contextlib.ExitStack() as stack:
+        if capture_output:
+            streams = stack.enter_context(output_streams(output_dir, capture=True))
+        return run_tox(
+            ["--result-json", str(tox_output_file), "-e", envname],
+            project_dir,
+            timings,
+            env_limits=env_limits,
+            usage_path=output_dir / f"usage_{envname}.json",
+            follower=follower,
+            env=env,
+            **streams,
         )
 
-    return results.AppSuiteRun(
-        injected=inject,
-        dependent_result=results.DependentResult.from_dir(
-            output_dir=results_dir, url=project_url
-        ),
+
+def pytest_plugins(
+    output_dir: pathlib.Path, node_ids: t.Optional[t.List[str]], follow: bool = False
+) -> t.Tuple[t.Dict[str, str], str]:
+    """Environment variables and pytest options loading checkon's pytest plugins.
+
+    ``-p checkon_select`` runs only ``node_ids``, unless that is None, and with
+    ``follow``, ``-p checkon_live`` writes each failure to ``live_{envname}.jsonl``.
+    """
+    setenv = {}
+    addopts = []
+    if node_ids is not None:
+        select_file = output_dir / "select.txt"
+        select_file.write_text("".join(f"{node_id}\n" for node_id in node_ids))
+        setenv["CHECKON_SELECT"] = str(select_file)
+        addopts.append("-p checkon_select")
+    if follow:
+        setenv["CHECKON_LIVE"] = str(output_dir / f"live_{output_dir.name}.jsonl")
+        addopts.append("-p checkon_live")
+    if setenv:
+        setenv["PYTHONPATH"] = str(PYTEST_PLUGIN_DIR)
+    return setenv, " ".join(addopts)
+
+
+def run_single_pass(
+    project_dir: pathlib.Path,
+    results_dir: pathlib.Path,
+    wheels: wheelhouse.Wheelhouse,
+    streams,
+    timings: t.List[dict],
+    skip: t.Sequence[str] = (),
+    select: t.Optional[t.Dict[str, t.Optional[t.List[str]]]] = None,
+    env_limits: limits.Limits = limits.Limits(),
+    follower: t.Optional[live.Follower] = None,
+) -> t.List[str]:
+    """Inject and test every selected toxenv in one tox session.
+
+    `checkon.toxplugin` does the work inside tox, so the config is parsed and the
+    envs are checked once instead of once per step and env. The ``env_limits``
+    and the ``follower``'s budget apply to the session as a whole, whose usage
+    goes to ``usage_run.json``.
+
+    Returns:
+        The names of the envs that ran to completion, leaving out those in ``skip``.
+    """
+    if follower is not None and follower.exhausted:
+        print(f"{project_dir}: skipping the run, out of failure budget")
+        return []
+
+    tox_output_file = results_dir / "tox_run.json"
+    env = {k: v for k, v in os.environ.items() if k != "TOXENV"}
+    process = run_tox(
+        ["--result-json", str(tox_output_file)],
+        project_dir,
+        timings,
+        env_limits=env_limits,
+        usage_path=results_dir / "usage_run.json",
+        follower=follower,
+        env={
+            **env,
+            "CHECKON_INJECT": json.dumps(wheels.inject_command()),
+            "CHECKON_RESULTS_DIR": str(results_dir),
+            "CHECKON_TOXENV": os.environ.get("TOXENV", ""),
+            "CHECKON_SKIP": json.dumps(list(skip)),
+            "CHECKON_NODE_IDS": json.dumps(select),
+            "CHECKON_FOLLOW": json.dumps(follower is not None),
+        },
+        **streams,
     )
+    if process.returncode < 0 or not tox_output_file.exists():
+        return []
 
+    # Give each env its own result file, as separate tox runs would.
+    tox_run = json.loads(tox_output_file.read_text())
+    envnames = []
+    for envname, testenv in tox_run.get("testenvs", {}).items():
+        output_dir = results_dir / envname
+        if output_dir.is_dir() and envname not in skip:
+            (output_dir / f"tox_{envname}.json").write_text(
+                json.dumps({**tox_run, "testenvs": {envname: testenv}})
+            )
+            envnames.append(envname)
+    return envnames
+
+
+def run_many(
+    project_urls: t.List[str],
+    inject: str,
+    jobs: int = 1,
+    env_jobs: int = 1,
+    single_pass: bool = False,
+    journal_path: t.Optional[pathlib.Path] = None,
+    timeout: t.Optional[float] = None,
+    cpu_limit: t.Optional[float] = None,
+    rss_limit_mb: t.Optional[int] = None,
+    follow: bool = False,
+    max_failures: t.Optional[int] = None,
+    max_run_failures: t.Optional[int] = None,
+    db_url: t.Optional[str] = None,
+) -> t.Dict[str, results.AppSuiteRun]:
+    """Run the dependents, up to ``jobs`` at a time and ``env_jobs`` toxenvs each.
+
+    An ``env_jobs`` of 0 runs one toxenv per CPU. With ``single_pass``, the toxenvs
+    of a dependent run one after another in a single tox session instead. With a
+    ``journal_path``, envs already run by an earlier, interrupted call are skipped.
+    A toxenv is killed once it runs longer than ``timeout`` seconds, uses more
+    than ``cpu_limit`` CPU seconds or more than ``rss_limit_mb`` of memory.
+    With ``follow``, failures are printed as they happen. A dependent is aborted after
+    ``max_failures`` failures, and the whole run after ``max_run_failures``. The
+    results are added to the database at ``db_url``, if given.
+    """
+    options = run_options(
+        env_jobs,
+        single_pass,
+        journal_path,
+        timeout,
+        cpu_limit,
+        rss_limit_mb,
+        follow,
+        max_failures,
+        max_run_failures,
+    )
+    with contextlib.ExitStack() as stack:
+        wheels = stack.enter_context(
+            wheelhouse.Wheelhouse.temporary(resolve_inject(inject))
+        )
+        if db_url is not None:
+            db = satests.Database.from_string(satests.database_url(db_url))
+            db.init()
+            ingester = stack.enter_context(ingest.Ingester(db))
+            options = attr.evolve(options, ingester=ingester)
+        url_to_runs = run_pool(project_urls, [wheels], jobs=jobs, options=options)
+    return {url: run for url, [run] in url_to_runs.items()}
+
+
+def run_options(
+    env_jobs: int = 1,
+    single_pass: bool = False,
+    journal_path: t.Optional[pathlib.Path] = None,
+    timeout: t.Optional[float] = None,
+    cpu_limit: t.Optional[float] = None,
+    rss_limit_mb: t.Optional[int] = None,
+    follow: bool = False,
+    max_failures: t.Optional[int] = None,
+    max_run_failures: t.Optional[int] = None,
+) -> RunOptions:
+    # Failure budgets are spent from the failures seen while following.
+    follow = follow or max_failures is not None or max_run_failures is not None
+    return RunOptions(
+        env_jobs=env_jobs or os.cpu_count(),
+        single_pass=single_pass,
+        run_journal=(
+            None if journal_path is None else journal.Journal.open(journal_path)
+        ),
+        env_limits=limits.Limits(
+            wall=timeout,
+            cpu=cpu_limit,
+            rss=None if rss_limit_mb is None else rss_limit_mb * 2 ** 20,
+        ),
+        follow=follow,
+        max_failures=max_failures,
+        run_budget=live.FailureBudget(max_run_failures) if follow else None,
+    )
 
-def run_many(project_urls: t.List[str], inject: str) -> t.List[results.DependentResult]:
-    inject = resolve_inject(inject)
-    url_to_res = {}
-    for url in project_urls:
-        url_to_res[url] = run_one(project_url=url, inject=inject)
 
-    return url_to_res
+def run_pool(
+    project_urls: t.List[str],
+    variants: t.Sequence[wheelhouse.Wheelhouse],
+    jobs: int = 1,
+    options: RunOptions = RunOptions(),
+    url_to_select: t.Optional[t.Dict[str, dict]] = None,
+) -> t.Dict[str, t.List[results.AppSuiteRun]]:
+    """Run `run_dependent` for each dependent, up to ``jobs`` at a time."""
+    if url_to_select is None:
+        url_to_select = {}
+    options = attr.evolve(options, capture_output=jobs > 1)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            url: executor.submit(
+                run_dependent,
+                project_url=url,
+                variants=variants,
+                options=options,
+                select=url_to_select.get(url),
+            )
+            for url in dict.fromkeys(project_urls)
+        }
+
+    return {url: future.result() for url, future in futures.items()}
 
 
 def extract_failed_tests(
@@ -234,20 +800,157 @@ def extract_failed_tests(
     return frozenset(out)
 
 
-def compare(project_urls: t.List[str], inject_new: str, inject_base: str):
-    base_result = run_many(project_urls, inject_base)
-    new_result = run_many(project_urls, inject_new)
+def failed_node_ids(
+    dependent_result: results.DependentResult
+) -> t.Dict[str, t.Optional[t.List[str]]]:
+    """The pytest node ids of the failed tests of each toxenv with failures.
 
-    db = satests.Database.from_string("sqlite:///:memory:", echo=True)
+    An env maps to None when some of its failures have no node id, such as trial
+    tests, so that it is rerun in full.
+    """
+    out = {}
+    for suite_run in dependent_result.suite_runs:
+        node_ids = {
+            # trial runs the tests of a subunit stream, not pytest.
+            None
+            if suite_run.suite.name == "subunit"
+            else results.FailedTest.from_test_case(test).node_id
+            for test in suite_run.suite.test_cases
+            if test.failure is not None
+        }
+        if node_ids:
+            out[suite_run.envname] = None if None in node_ids else sorted(node_ids)
+    return out
+
+
+def compare(
+    project_urls: t.List[str],
+    inject_new: str,
+    inject_base: str,
+    jobs: int = 1,
+    env_jobs: int = 1,
+    single_pass: bool = False,
+    journal_path: t.Optional[pathlib.Path] = None,
+    fast: bool = False,
+    timeout: t.Optional[float] = None,
+    cpu_limit: t.Optional[float] = None,
+    rss_limit_mb: t.Optional[int] = None,
+    follow: bool = False,
+    max_failures: t.Optional[int] = None,
+    max_run_failures: t.Optional[int] = None,
+    db_url: t.Optional[str] = None,
+    hide_passed: bool = False,
+    changes: bool = False,
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    """Test the dependents with both injects, and report each test's runs.
+
+    With ``fast``, the new inject runs first, and the base inject runs only the
+    tests that failed with it, telling regressions from failures that were there
+    before. Those reruns are expected to fail, so no failure budget applies to them.
+    The results are kept in the database at ``db_url``, if given, and the report
+    covers only this comparison. It has only the failures with ``hide_passed``,
+    and, with ``changes``, only the tests whose result or failure message changed
+    from base to new. Its rows are read from the database as they are iterated.
+    """
+    options = run_options(
+        env_jobs,
+        single_pass,
+        journal_path,
+        timeout,
+        cpu_limit,
+        rss_limit_mb,
+        follow,
+        max_failures,
+        max_run_failures,
+    )
+    db = satests.Database.from_string(
+        "sqlite:///:memory:" if db_url is None else satests.database_url(db_url),
+        echo=True,
+    )
     db.init()
 
-    for url, result in base_result.items():
-        satests.insert_result(db, result)
+    with contextlib.ExitStack() as stack:
+        # Both sides share each dependent's checkout and envs, differing only in the
+        # injected package.
+        base, new = [
+            stack.enter_context(wheelhouse.Wheelhouse.temporary(resolve_inject(inject)))
+            for inject in [inject_base, inject_new]
+        ]
+        # Runs are inserted as they finish, while the others are still testing.
+        ingester = stack.enter_context(ingest.Ingester(db))
+        options = attr.evolve(options, ingester=ingester)
+        if fast:
+            new_runs = {
+                url: run
+                for url, [run] in run_pool(
+                    project_urls, [new], jobs=jobs, options=options
+                ).items()
+            }
+            url_to_select = {
+                url: failed_node_ids(run.dependent_result)
+                for url, run in new_runs.items()
+            }
+            base_runs = {
+                url: run
+                for url, [run] in run_pool(
+                    [url for url, select in url_to_select.items() if select],
+                    [base],
+                    jobs=jobs,
+                    options=attr.evolve(
+                        options, max_failures=None, run_budget=live.FailureBudget()
+                    ),
+                    url_to_select=url_to_select,
+                ).items()
+            }
+        else:
+            url_to_runs = run_pool(
+                project_urls, [base, new], jobs=jobs, options=options
+            )
+            base_runs = {url: base_run for url, [base_run, _] in url_to_runs.items()}
+            new_runs = {url: new_run for url, [_, new_run] in url_to_runs.items()}
+
+        base_tox_run_ids, new_tox_run_ids = [
+            [ingester.tox_run_id(run) for run in side.values()]
+            for side in [base_runs, new_runs]
+        ]
+    if changes:
+        return satests.stream_rows(
+            db,
+            changes_report_query(),
+            base_tox_run_ids=base_tox_run_ids,
+            new_tox_run_ids=new_tox_run_ids,
+        )
+    return satests.stream_rows(
+        db,
+        report_query(),
+        tox_run_ids=base_tox_run_ids + new_tox_run_ids,
+        hide_passed=hide_passed,
+    )
+
+
+def prepare_report(
+    sql: str, id_lists: t.List[str], **values
+) -> sa.sql.expression.TextAsFrom:
+    """``sql`` for execution with a list of tox run ids for each of ``id_lists``."""
+    return (
+        sa.text(sql)
+        .bindparams(
+            *[sa.bindparam(name, expanding=True) for name in id_lists], **values
+        )
+        .columns(text=satests.CompressedText)
+    )
 
-    for url, result in new_result.items():
-        satests.insert_result(db, result)
 
-    return [dict(zip(d.keys(), d.values())) for d in (db.engine.execute(query))]
+def report_query(prefix: str = "") -> sa.sql.expression.TextAsFrom:
+    """`query` for execution with a list of ``tox_run_ids``, after ``prefix``."""
+    return prepare_report(prefix + query, ["tox_run_ids"], hide_passed=False)
+
+
+def changes_report_query(prefix: str = "") -> sa.sql.expression.TextAsFrom:
+    """`changes_query` for execution with the ids of both sides, after ``prefix``."""
+    return prepare_report(
+        prefix + changes_query, ["base_tox_run_ids", "new_tox_run_ids"]
+    )
 
 
 query = """
@@ -261,12 +964,59 @@ SELECT
     fo.message,
     fo.text
 
-FROM test_case_run tcr
+FROM tox_run tr
+JOIN toxenv_run ter ON ter.tox_run_id = tr.tox_run_id
+JOIN test_suite_run tsr ON tsr.test_suite_run_id = ter.test_suite_run_id
+JOIN test_case_run tcr ON tcr.test_suite_run_id = tsr.test_suite_run_id
+JOIN test_case tc ON tcr.test_case_id = tc.test_case_id
 LEFT JOIN test_failure tf ON tcr.test_failure_id = tf.test_failure_id
-LEFT JOIN test_suite_run tsr ON tsr.test_suite_run_id = tcr.test_suite_run_id
-LEFT JOIN toxenv_run ter ON ter.test_suite_run_id = tsr.test_suite_run_id
-LEFT JOIN tox_run tr ON tr.tox_run_id = ter.tox_run_id
 LEFT JOIN failure_output fo ON tf.failure_output_id = fo.failure_output_id
-LEFT JOIN test_case tc ON tcr.test_case_id = tc.test_case_id
+WHERE tr.tox_run_id IN :tox_run_ids
+    AND (NOT :hide_passed OR tcr.test_failure_id IS NOT NULL)
 ORDER BY ter.envname, tr.application, tc.classname, tc.line, tc.name, tr.provider
 """
+
+
+# The tests whose result or failure message differs between the base and new runs
+# of a dependent's toxenv. The CROSS JOIN makes SQLite find the base suite first,
+# rather than every run of the test, to look up the base run by both. Other
+# databases reject it with ON, which is one reason `database_url` takes only SQLite.
+changes_query = """
+SELECT
+    CASE
+        WHEN btcr.test_failure_id IS NULL THEN 'new failure'
+        WHEN ntcr.test_failure_id IS NULL THEN 'fixed'
+        ELSE 'changed'
+    END AS change,
+    nter.envname,
+    ntr.application,
+    tc.classname,
+    tc.name,
+    tc.line,
+    btr.provider AS base_provider,
+    bfo.message AS base_message,
+    ntr.provider AS new_provider,
+    nfo.message AS new_message,
+    coalesce(nfo.text, bfo.text) AS text
+
+FROM tox_run ntr
+JOIN toxenv_run nter ON nter.tox_run_id = ntr.tox_run_id
+JOIN test_case_run ntcr ON ntcr.test_suite_run_id = nter.test_suite_run_id
+JOIN tox_run btr ON btr.application = ntr.application
+JOIN toxenv_run bter ON bter.tox_run_id = btr.tox_run_id AND bter.envname = nter.envname
+CROSS JOIN test_case_run btcr
+    ON btcr.test_suite_run_id = bter.test_suite_run_id
+    AND btcr.test_case_id = ntcr.test_case_id
+JOIN test_case tc ON tc.test_case_id = ntcr.test_case_id
+LEFT JOIN test_failure ntf ON ntf.test_failure_id = ntcr.test_failure_id
+LEFT JOIN failure_output nfo ON nfo.failure_output_id = ntf.failure_output_id
+LEFT JOIN test_failure btf ON btf.test_failure_id = btcr.test_failure_id
+LEFT JOIN failure_output bfo ON bfo.failure_output_id = btf.failure_output_id
+WHERE ntr.tox_run_id IN :new_tox_run_ids
+    AND btr.tox_run_id IN :base_tox_run_ids
+    AND (
+        (ntcr.test_failure_id IS NULL) != (btcr.test_failure_id IS NULL)
+        OR nfo.message IS NOT bfo.message
+    )
+ORDER BY nter.envname, ntr.application, tc.classname, tc.line, tc.name
+"""
@@ -1,4 +1,6 @@
+import itertools
 import pathlib
+import typing as t
 
 import click
 import tabulate
@@ -6,20 +8,64 @@ import tabulate
 import checkon.results
 
 from . import app
+from . import export
+from . import satests
 
 
-def run_cli(urls_lists, **kw):
+def run_cli(urls_lists, hide_passed, **kw):
     urls = [url for urls in urls_lists for url in urls]
 
-    print(app.run_many(project_urls=urls, **kw))
+    url_to_run = app.run_many(project_urls=urls, **kw)
+    if hide_passed:
+        print(
+            {
+                url: app.extract_failed_tests(run.dependent_result)
+                for url, run in url_to_run.items()
+            }
+        )
+    else:
+        print(url_to_run)
+
+
+# Rows of a report printed in each table, so big reports start printing early.
+TABLE_ROWS = 1000
+
+
+def print_tables(records: t.Iterable[t.Dict[str, t.Any]]):
+    records = iter(records)
+    while True:
+        table = list(itertools.islice(records, TABLE_ROWS))
+        if not table:
+            break
+        print(tabulate.tabulate(table, headers="keys"))
 
 
-def compare_cli(urls_lists, hide_passed, **kw):
+def compare_cli(urls_lists, **kw):
     urls = [url for urls in urls_lists for url in urls]
-    records = checkon.app.compare(project_urls=urls, **kw)
-    if hide_passed:
-        records = [r for r in records if r["text"] is not None]
-    print(tabulate.tabulate(records, headers="keys"))
+    print_tables(checkon.app.compare(project_urls=urls, **kw))
+
+
+def open_database(db_url):
+    db = satests.Database.from_string(satests.database_url(db_url))
+    db.init()
+    return db
+
+
+def failure_history_cli(db_url, name, classname, application):
+    rows = satests.failure_history(open_database(db_url), name, classname, application)
+    print_tables(rows)
+
+
+def pass_rate_cli(db_url, application):
+    rows = satests.pass_rates(open_database(db_url), application)
+    print_tables(rows)
+
+
+def export_cli(db_url, output_dir):
+    tox_runs, test_case_runs = export.export(
+        open_database(db_url), pathlib.Path(output_dir)
+    )
+    print(f"Exported {test_case_runs} test case runs of {tox_runs} tox runs.")
 
 
 def read_from_file(file):
@@ -59,10 +105,110 @@ dependents = [
 ]
 
 
+def jobs_option():
+    return click.Option(
+        ["--jobs", "-j"],
+        type=click.IntRange(min=1),
+        default=1,
+        help="Number of dependents to run concurrently.",
+    )
+
+
+def env_jobs_option():
+    return click.Option(
+        ["--env-jobs"],
+        type=click.IntRange(min=0),
+        default=1,
+        help="Number of toxenvs of each dependent to run concurrently, 0 for one per CPU.",
+    )
+
+
+def single_pass_option():
+    return click.Option(
+        ["--single-pass"],
+        is_flag=True,
+        help="Inject and test all toxenvs of a dependent in one tox session.",
+    )
+
+
+def journal_option():
+    return click.Option(
+        ["--journal", "journal_path"],
+        type=click.Path(dir_okay=False),
+        help="Record finished toxenvs here, and skip those already recorded.",
+    )
+
+
+def limit_options():
+    return [
+        click.Option(
+            ["--timeout"],
+            type=click.FloatRange(min=0),
+            help="Kill a toxenv that runs longer than this many seconds.",
+        ),
+        click.Option(
+            ["--cpu-limit"],
+            type=click.FloatRange(min=0),
+            help="Kill a toxenv that uses more than this many CPU seconds.",
+        ),
+        click.Option(
+            ["--rss-limit", "rss_limit_mb"],
+            type=click.IntRange(min=1),
+            help="Kill a toxenv whose processes use more than this many MB of memory.",
+        ),
+    ]
+
+
+def follow_options():
+    return [
+        click.Option(
+            ["--live", "follow"], is_flag=True, help="Print failures as they happen."
+        ),
+        click.Option(
+            ["--max-failures"],
+            type=click.IntRange(min=1),
+            help="Abort a dependent after this many failures. Implies --live.",
+        ),
+        click.Option(
+            ["--max-run-failures"],
+            type=click.IntRange(min=1),
+            help="Abort the run after this many failures in all. Implies --live.",
+        ),
+    ]
+
+
+def check_database_url(ctx, param, value):
+    if value is not None:
+        try:
+            satests.database_url(value)
+        except ValueError as e:
+            raise click.BadParameter(str(e))
+    return value
+
+
+def db_option(required=False):
+    return click.Option(
+        ["--db", "db_url"],
+        required=required,
+        callback=check_database_url,
+        help="Keep results in this SQLite file, or at this sqlite:// URL.",
+    )
+
+
 test = click.Group(
     "test",
     commands={c.name: c for c in dependents},
-    params=[click.Option(["--inject"]), click.Option(["--hide-passed"], is_flag=True)],
+    params=[
+        click.Option(["--inject"]),
+        click.Option(["--hide-passed"], is_flag=True),
+        jobs_option(),
+        env_jobs_option(),
+        single_pass_option(),
+        journal_option(),
+        *limit_options(),
+        *follow_options(),
+        db_option(),
+    ],
     result_callback=run_cli,
     chain=True,
 )
@@ -75,12 +221,68 @@ compare = click.Group(
         click.Option(["--inject-new"]),
         click.Option(["--inject-base"]),
         click.Option(["--hide-passed"], is_flag=True),
+        click.Option(
+            ["--changes"],
+            is_flag=True,
+            help="Show only the tests whose result or failure message changed.",
+        ),
+        click.Option(
+            ["--fast"],
+            is_flag=True,
+            help="Run the base inject only on the tests failing with the new one.",
+        ),
+        jobs_option(),
+        env_jobs_option(),
+        single_pass_option(),
+        journal_option(),
+        *limit_options(),
+        *follow_options(),
+        db_option(),
     ],
     result_callback=compare_cli,
     chain=True,
 )
 
 
+history = click.Group(
+    "history",
+    commands={
+        "failures": click.Command(
+            "failures",
+            params=[
+                click.Argument(["name"]),
+                click.Option(["--classname"]),
+                click.Option(["--application"], help="The dependent's url."),
+                db_option(required=True),
+            ],
+            callback=failure_history_cli,
+            help="Show each run of the tests called NAME, oldest first.",
+        ),
+        "pass-rate": click.Command(
+            "pass-rate",
+            params=[
+                click.Option(["--application"], help="The dependent's url."),
+                db_option(required=True),
+            ],
+            callback=pass_rate_cli,
+            help="Show the pass rate of each run of each dependent, oldest first.",
+        ),
+    },
+    help="Query the results kept in a database.",
+)
+
+
+export_command = click.Command(
+    "export",
+    params=[click.Argument(["output-dir"]), db_option(required=True)],
+    callback=export_cli,
+    help=(
+        "Append the test case runs not exported yet to OUTPUT_DIR, as Parquet"
+        " partitioned by provider, application and date. Needs pyarrow."
+    ),
+)
+
+
 def list_cli(dicts):
     return dicts
 
@@ -89,5 +291,12 @@ list_commands = click.Group(
     "list", commands={c.name: c for c in dependents}, result_callback=list_cli
 )
 cli = click.Group(
-    "run", commands={"test": test, "list": list_commands, "compare": compare}
+    "run",
+    commands={
+        "test": test,
+        "list": list_commands,
+        "compare": compare,
+        "history": history,
+        "export": export_command,
+    },
 )
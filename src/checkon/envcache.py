@@ -0,0 +1,81 @@
+"""Pristine snapshots of tox environments, reused across runs and injects."""
+import hashlib
+import json
+import pathlib
+import shutil
+import subprocess
+import tempfile
+import typing as t
+
+
+ENVS_DIR = pathlib.Path("/tmp/checkon/envs")
+
+
+def snapshot_key(rev: str, envname: str, installed_packages: t.Iterable[str]) -> str:
+    digest = hashlib.sha256()
+    for part in [rev, envname, *sorted(installed_packages)]:
+        digest.update(part.encode() + b"\0")
+    return digest.hexdigest()[:16]
+
+
+def index_path(rev: str) -> pathlib.Path:
+    return ENVS_DIR / f"{rev}.json"
+
+
+def has_snapshots(rev: str) -> bool:
+    return index_path(rev).exists()
+
+
+def clone_tree(src: pathlib.Path, dst: pathlib.Path):
+    """Copy ``src`` to ``dst``, sharing blocks with reflinks where the filesystem can.
+
+    Hardlinks would be cheaper still, but pip rewrites some files in place (``.pth``
+    files, for instance), which would leak into the snapshot.
+    """
+    try:
+        subprocess.run(
+            ["cp", "-a", "--reflink=auto", str(src), str(dst)],
+            check=True,
+            stderr=subprocess.DEVNULL,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        shutil.rmtree(dst, ignore_errors=True)
+        shutil.copytree(src, dst, symlinks=True)
+
+
+def snapshot(rev: str, install_json_path: pathlib.Path):
+    """Snapshot the envs listed in the ``tox --result-json`` output of an install run."""
+    testenvs = json.loads(pathlib.Path(install_json_path).read_text())["testenvs"]
+    ENVS_DIR.mkdir(parents=True, exist_ok=True)
+    index = {}
+    for envname, testenv in testenvs.items():
+        if "installed_packages" not in testenv:
+            # The env could not be created.
+            continue
+        key = snapshot_key(rev, envname, testenv["installed_packages"])
+        envdir = pathlib.Path(testenv["python"]["executable"]).parent.parent
+        target = ENVS_DIR / key
+        if not target.exists():
+            staging = pathlib.Path(tempfile.mkdtemp(dir=ENVS_DIR)) / key
+            clone_tree(envdir, staging)
+            staging.rename(target)
+            staging.parent.rmdir()
+        index[envname] = {"envdir": str(envdir), "snapshot": key}
+
+    index_path(rev).write_text(json.dumps(index))
+
+
+def restore(rev: str) -> bool:
+    """Reset the envs of ``rev`` to their snapshots.
+
+    Returns:
+        Whether there were snapshots to restore.
+    """
+    if not has_snapshots(rev):
+        return False
+
+    for entry in json.loads(index_path(rev).read_text()).values():
+        envdir = pathlib.Path(entry["envdir"])
+        shutil.rmtree(envdir, ignore_errors=True)
+        clone_tree(ENVS_DIR / entry["snapshot"], envdir)
+    return True
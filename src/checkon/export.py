@@ -0,0 +1,143 @@
+"""Exporting test case runs to partitioned Parquet files, for analysis elsewhere."""
+import itertools
+import json
+import pathlib
+import typing as t
+
+import sqlalchemy as sa
+
+from . import satests
+
+
+# One row per test case run, with what is needed to analyze it alone.
+EXPORT_QUERY = """
+SELECT
+    tr.tox_run_id,
+    tr.provider,
+    tr.application,
+    date(tr.start_time) AS date,
+    tr.start_time,
+    ter.envname,
+    tc.classname,
+    tc.name,
+    tc.file,
+    tc.line,
+    CAST(tcr.duration AS REAL) AS duration,
+    tcr.test_failure_id IS NOT NULL AS failed,
+    fo.message
+FROM tox_run tr
+JOIN toxenv_run ter ON ter.tox_run_id = tr.tox_run_id
+JOIN test_case_run tcr ON tcr.test_suite_run_id = ter.test_suite_run_id
+JOIN test_case tc ON tc.test_case_id = tcr.test_case_id
+LEFT JOIN test_failure tf ON tf.test_failure_id = tcr.test_failure_id
+LEFT JOIN failure_output fo ON fo.failure_output_id = tf.failure_output_id
+WHERE tr.tox_run_id > :after
+ORDER BY tr.tox_run_id
+"""
+
+# pyarrow 10 and later URI-encode partition values in directory names, so URLs
+# and paths stay one directory each.
+PARTITION_COLUMNS = ["provider", "application", "date"]
+
+# Rows written at once, at least. Batches end with a tox run.
+EXPORT_BATCH_ROWS = 100000
+
+# Kept in the export directory. Parquet readers skip files starting with "_".
+STATE_FILE = "_checkon_export.json"
+
+
+def import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError(
+            "Exporting to Parquet needs pyarrow: pip install 'checkon[parquet]'"
+        ) from None
+    return pyarrow, pyarrow.parquet
+
+
+def arrow_schema(pa):
+    return pa.schema(
+        [
+            ("tox_run_id", pa.int64()),
+            ("provider", pa.string()),
+            ("application", pa.string()),
+            ("date", pa.string()),
+            ("start_time", pa.timestamp("us")),
+            ("envname", pa.string()),
+            ("classname", pa.string()),
+            ("name", pa.string()),
+            ("file", pa.string()),
+            ("line", pa.int64()),
+            ("duration", pa.float64()),
+            ("failed", pa.bool_()),
+            ("message", pa.string()),
+        ]
+    )
+
+
+def exported_tox_run_id(output_dir: pathlib.Path) -> int:
+    """The last tox run exported to ``output_dir``, or 0."""
+    path = output_dir / STATE_FILE
+    if not path.exists():
+        return 0
+    return json.loads(path.read_text())["tox_run_id"]
+
+
+def record_exported(output_dir: pathlib.Path, tox_run_id: int):
+    path = output_dir / STATE_FILE
+    temporary = path.with_suffix(".tmp")
+    temporary.write_text(json.dumps({"tox_run_id": tox_run_id}))
+    temporary.replace(path)
+
+
+def batches(
+    rows: t.Iterator[t.Dict[str, t.Any]], size: int
+) -> t.Iterator[t.List[t.Dict[str, t.Any]]]:
+    """Lists of at least ``size`` rows, but for the last, never splitting a tox run."""
+    batch = []
+    for _, run_rows in itertools.groupby(rows, lambda r: r["tox_run_id"]):
+        batch.extend(run_rows)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export(
+    db: satests.Database, output_dir: pathlib.Path, batch_rows: int = EXPORT_BATCH_ROWS
+) -> t.Tuple[int, int]:
+    """Append the test case runs of the tox runs not exported yet to ``output_dir``.
+
+    They are written as a Parquet dataset partitioned by provider, application
+    and date. The last tox run exported is recorded after each batch, so an
+    interrupted export picks up after it. Returns the number of tox runs and of
+    test case runs exported.
+
+    The files of a batch are named after its first tox run. A batch written
+    again, after an export interrupted before recording it, starts with the same
+    run and has at least its rows, so it replaces those files.
+    """
+    pa, pq = import_pyarrow()
+    schema = arrow_schema(pa)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    query = sa.text(EXPORT_QUERY).columns(start_time=sa.DateTime, failed=sa.Boolean)
+    rows = satests.stream_rows(db, query, after=exported_tox_run_id(output_dir))
+    tox_runs = test_case_runs = 0
+    for batch in batches(rows, batch_rows):
+        table = pa.Table.from_pydict(
+            {name: [row[name] for row in batch] for name in schema.names}, schema
+        )
+        pq.write_to_dataset(
+            table,
+            str(output_dir),
+            partition_cols=PARTITION_COLUMNS,
+            basename_template=f"part-{batch[0]['tox_run_id']}-{{i}}.parquet",
+            existing_data_behavior="overwrite_or_ignore",
+        )
+        record_exported(output_dir, batch[-1]["tox_run_id"])
+        tox_runs += len({row["tox_run_id"] for row in batch})
+        test_case_runs += len(batch)
+    return tox_runs, test_case_runs
@@ -0,0 +1,149 @@
+"""Inserting results into a database from one writer thread, as dependents finish."""
+import concurrent.futures
+import queue
+import threading
+import time
+import typing as t
+
+import attr
+
+from . import results
+from . import satests
+
+
+# Runs inserted in one transaction at most.
+MAX_BATCH_RUNS = 16
+
+_CLOSE = object()
+
+Pending = t.Tuple[results.AppSuiteRun, concurrent.futures.Future]
+
+
+@attr.s(auto_attribs=True)
+class IngestStats:
+    """What the writer has committed so far, and how long the queue got."""
+
+    commits: int = 0
+    runs: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    max_depth: int = 0
+
+    def record(self, runs: int, seconds: float, depth: int):
+        self.commits += 1
+        self.runs += runs
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.max_depth = max(self.max_depth, depth)
+
+    def summary(self) -> str:
+        mean = self.seconds / self.commits if self.commits else 0.0
+        return (
+            f"ingest: {self.runs} runs in {self.commits} commits,"
+            f" {mean:.2f}s mean and {self.max_seconds:.2f}s max commit latency,"
+            f" {self.max_depth} max queue depth"
+        )
+
+
+class Ingester:
+    """Inserts the results put to it from a single writer thread.
+
+    Workers put each `AppSuiteRun` as it finishes and carry on testing; the queue
+    is unbounded, so they never wait on the database. The writer inserts all
+    the runs waiting, up to ``max_batch_runs``, in one transaction. While runs
+    are waiting after a commit, it prints the queue depth and commit latency.
+    """
+
+    def __init__(
+        self,
+        db: satests.Database,
+        batch_size: int = satests.BATCH_SIZE,
+        max_batch_runs: int = MAX_BATCH_RUNS,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.max_batch_runs = max_batch_runs
+        self.stats = IngestStats()
+        self.queue: queue.Queue = queue.Queue()
+        self.futures: t.Dict[int, Pending] = {}
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._write, name="ingest", daemon=True)
+        self.thread.start()
+
+    def put(self, run: results.AppSuiteRun) -> concurrent.futures.Future:
+        """Queue ``run`` for insertion. The future is set to its `ToxRun` id."""
+        future = concurrent.futures.Future()
+        with self.lock:
+            # Keyed by identity, keeping the run alive so its id isn't reused.
+            self.futures[id(run)] = (run, future)
+        self.queue.put((run, future))
+        return future
+
+    def add_inserted(self, run: results.AppSuiteRun, tox_run_id: int):
+        """Look ``run`` up as ``tox_run_id``, which an earlier call inserted."""
+        future = concurrent.futures.Future()
+        future.set_result(tox_run_id)
+        with self.lock:
+            self.futures[id(run)] = (run, future)
+
+    def tox_run_id(self, run: results.AppSuiteRun) -> int:
+        """Wait for ``run``, put earlier, to be inserted, and return its id."""
+        with self.lock:
+            _, future = self.futures[id(run)]
+        return future.result()
+
+    def close(self):
+        """Insert the runs still queued and stop the writer.
+
+        Raises the first error inserting a run, if any.
+        """
+        self.queue.put(_CLOSE)
+        self.thread.join()
+        if self.stats.commits:
+            print(self.stats.summary())
+        with self.lock:
+            futures = [future for _, future in self.futures.values()]
+        for future in futures:
+            future.result()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _write(self):
+        closing = False
+        while not closing:
+            batch = [self.queue.get()]
+            while len(batch) < self.max_batch_runs:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = _CLOSE in batch
+            batch = [item for item in batch if item is not _CLOSE]
+            if batch:
+                self._commit(batch)
+
+    def _commit(self, batch: t.List[Pending]):
+        start = time.monotonic()
+        try:
+            tox_run_ids = satests.insert_results(
+                self.db, [run for run, _ in batch], self.batch_size
+            )
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        seconds = time.monotonic() - start
+        for [_, future], tox_run_id in zip(batch, tox_run_ids):
+            future.set_result(tox_run_id)
+
+        depth = self.queue.qsize()
+        self.stats.record(len(batch), seconds, depth)
+        if depth:
+            print(
+                f"ingest: committed {len(batch)} runs in {seconds:.2f}s,"
+                f" {depth} queued"
+            )
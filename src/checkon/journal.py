@@ -0,0 +1,100 @@
+"""A record of finished toxenvs, letting an interrupted run pick up where it stopped."""
+import json
+import os
+import pathlib
+import shutil
+import threading
+import typing as t
+
+import attr
+
+
+@attr.dataclass
+class Journal:
+    """Append-only log of ``(url, rev, envname, inject)`` units and their result dirs.
+
+    Each completed unit is one JSON line, flushed to disk before the next unit
+    starts, so whatever finished before a crash is kept. So is the `ToxRun` id
+    of each ``(url, rev, inject)`` inserted into a database, so that it is not
+    inserted again.
+    """
+
+    path: pathlib.Path
+    _entries: t.Dict[t.Tuple[str, str, str, str], str] = attr.ib(factory=dict)
+    _tox_run_ids: t.Dict[t.Tuple[str, str, str, str], int] = attr.ib(factory=dict)
+    _lock: threading.Lock = attr.ib(factory=threading.Lock)
+
+    @classmethod
+    def open(cls, path):
+        path = pathlib.Path(path)
+        journal = cls(path)
+        if path.exists():
+            for line in path.read_text().splitlines():
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by the crash.
+                    continue
+                if "tox_run_id" in entry:
+                    journal._tox_run_ids[
+                        entry["url"], entry["rev"], entry["inject"], entry["database"]
+                    ] = entry["tox_run_id"]
+                    continue
+                journal._entries[
+                    entry["url"], entry["rev"], entry["envname"], entry["inject"]
+                ] = entry["output_dir"]
+        return journal
+
+    def completed(self, url, rev: str, inject: str) -> t.Dict[str, pathlib.Path]:
+        """The envs already run for this dependent revision and inject, by name."""
+        with self._lock:
+            return {
+                envname: pathlib.Path(output_dir)
+                for (u, r, envname, i), output_dir in self._entries.items()
+                if (u, r, i) == (str(url), rev, inject)
+                and pathlib.Path(output_dir).is_dir()
+            }
+
+    def record(self, url, rev: str, envname: str, inject: str, output_dir):
+        entry = {
+            "url": str(url),
+            "rev": rev,
+            "envname": envname,
+            "inject": inject,
+            "output_dir": str(output_dir),
+        }
+        with self._lock:
+            self._append(entry)
+            self._entries[str(url), rev, envname, inject] = str(output_dir)
+
+    def tox_run_id(self, url, rev: str, inject: str, database: str) -> t.Optional[int]:
+        """The id of the run of this dependent revision and inject in ``database``."""
+        with self._lock:
+            return self._tox_run_ids.get((str(url), rev, inject, database))
+
+    def record_tox_run_id(
+        self, url, rev: str, inject: str, database: str, tox_run_id: int
+    ):
+        entry = {
+            "url": str(url),
+            "rev": rev,
+            "inject": inject,
+            "database": database,
+            "tox_run_id": tox_run_id,
+        }
+        with self._lock:
+            self._append(entry)
+            self._tox_run_ids[str(url), rev, inject, database] = tox_run_id
+
+    def _append(self, entry: t.Dict[str, t.Any]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def copy_results(completed: t.Dict[str, pathlib.Path], results_dir: pathlib.Path):
+    """Copy the results of ``completed`` envs into ``results_dir``."""
+    for envname, output_dir in completed.items():
+        shutil.copytree(output_dir, results_dir / envname)
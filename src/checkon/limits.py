@@ -0,0 +1,177 @@
+"""Resource limits and usage accounting for the tox sessions checkon starts."""
+import json
+import os
+import pathlib
+import signal
+import subprocess
+import threading
+import time
+import typing as t
+
+import attr
+
+
+POLL_INTERVAL = 0.5
+
+
+@attr.dataclass(frozen=True)
+class Limits:
+    """Limits on one tox session and everything it starts. None means unlimited.
+
+    CPU and RSS are summed over the session's processes as seen in ``/proc``, so
+    they are only enforced where there is one.
+    """
+
+    wall: t.Optional[float] = None
+    cpu: t.Optional[float] = None
+    rss: t.Optional[int] = None
+
+    def exceeded(self, wall: float, cpu: float, rss: int) -> t.Optional[str]:
+        for name, used, limit in [
+            ("wall", wall, self.wall),
+            ("cpu", cpu, self.cpu),
+            ("rss", rss, self.rss),
+        ]:
+            if limit is not None and used > limit:
+                return name
+        return None
+
+
+@attr.dataclass(frozen=True)
+class Usage:
+    """What a tox session used, as reported by ``wait4``.
+
+    ``max_rss`` is in bytes. ``killed`` names the limit the session was killed for.
+    """
+
+    wall: float
+    user: float
+    sys: float
+    max_rss: int
+    returncode: int
+    killed: t.Optional[str] = None
+
+    @classmethod
+    def from_path(cls, path):
+        return cls(**json.loads(pathlib.Path(path).read_text()))
+
+    def write(self, path):
+        pathlib.Path(path).write_text(json.dumps(attr.asdict(self)))
+
+
+def session_processes(sid: int) -> t.List[t.Tuple[int, float, int]]:
+    """The pid, CPU seconds and RSS bytes of each live process in session ``sid``.
+
+    The CPU seconds include the children each process has waited for.
+    """
+    ticks = os.sysconf("SC_CLK_TCK")
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    out = []
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            stat = pathlib.Path("/proc", name, "stat").read_text()
+        except OSError:
+            # The process is gone.
+            continue
+        # The command name may contain spaces, so split after it.
+        fields = stat[stat.rindex(")") + 2 :].split()
+        if int(fields[3]) != sid:
+            continue
+        cpu = sum(int(field) for field in fields[11:15]) / ticks
+        out.append((int(name), cpu, int(fields[21]) * page_size))
+    return out
+
+
+def kill_session(sid: int):
+    """Kill the processes of session ``sid``, including those in other groups."""
+    try:
+        os.killpg(sid, signal.SIGKILL)
+    except OSError:
+        pass
+    if not os.path.isdir("/proc"):
+        return
+    for pid, _, _ in session_processes(sid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def watch(
+    sid: int,
+    limits: Limits,
+    start: float,
+    done: threading.Event,
+    killed: list,
+    abort: t.Optional[t.Callable[[], t.Optional[str]]] = None,
+):
+    """Kill session ``sid`` once it exceeds ``limits``, until ``done`` is set.
+
+    ``abort`` is called on each poll too, and the session is killed once it
+    returns the name of a limit.
+    """
+    while not done.wait(POLL_INTERVAL):
+        processes = []
+        if os.path.isdir("/proc"):
+            processes = session_processes(sid)
+        reason = limits.exceeded(
+            wall=time.monotonic() - start,
+            cpu=sum(cpu for _, cpu, _ in processes),
+            rss=sum(rss for _, _, rss in processes),
+        )
+        if reason is None and abort is not None:
+            reason = abort()
+        if reason is not None:
+            killed.append(reason)
+            kill_session(sid)
+            return
+
+
+def run(
+    args: t.List[str],
+    limits: Limits = Limits(),
+    abort: t.Optional[t.Callable[[], t.Optional[str]]] = None,
+    **kw,
+) -> t.Tuple[subprocess.CompletedProcess, Usage]:
+    """Run ``args`` in a new session, killing the session if it exceeds ``limits``.
+
+    ``abort`` is passed on to `watch`, and ``kw`` to `subprocess.Popen`.
+    """
+    start = time.monotonic()
+    process = subprocess.Popen(args, start_new_session=True, **kw)
+    done = threading.Event()
+    killed = []
+    watcher = threading.Thread(
+        target=watch,
+        args=(process.pid, limits, start, done, killed, abort),
+        daemon=True,
+    )
+    watcher.start()
+    try:
+        _, status, rusage = os.wait4(process.pid, 0)
+    finally:
+        done.set()
+        watcher.join()
+
+    if os.WIFSIGNALED(status):
+        returncode = -os.WTERMSIG(status)
+    else:
+        returncode = os.WEXITSTATUS(status)
+    # Popen must not wait for the pid again.
+    process.returncode = returncode
+    if killed:
+        # Clean up whatever outlived the session leader.
+        kill_session(process.pid)
+
+    usage = Usage(
+        wall=time.monotonic() - start,
+        user=rusage.ru_utime,
+        sys=rusage.ru_stime,
+        # Linux reports kilobytes.
+        max_rss=rusage.ru_maxrss * 1024,
+        returncode=returncode,
+        killed=killed[0] if killed else None,
+    )
+    return subprocess.CompletedProcess(args, returncode), usage
@@ -0,0 +1,159 @@
+"""Following the failures of dependents while they run, and aborting them early."""
+import io
+import json
+import pathlib
+import threading
+import typing as t
+
+import attr
+
+from . import results
+
+
+LIVE_GLOB = "live_*.jsonl"
+SUBUNIT_GLOB = "test_*.subunit"
+
+
+@attr.s(auto_attribs=True)
+class FailureBudget:
+    """How many failures a run may have before it is aborted. None means unlimited.
+
+    Failures spent from a budget are spent from its ``parent`` too, so one budget
+    per dependent can share a budget for the whole run.
+    """
+
+    limit: t.Optional[int] = None
+    parent: t.Optional["FailureBudget"] = None
+    spent: int = 0
+    _lock: threading.Lock = attr.ib(factory=threading.Lock, repr=False)
+
+    def spend(self, count: int):
+        with self._lock:
+            self.spent += count
+        if self.parent is not None:
+            self.parent.spend(count)
+
+    @property
+    def exhausted(self) -> bool:
+        if self.limit is not None and self.spent >= self.limit:
+            return True
+        return self.parent is not None and self.parent.exhausted
+
+
+@attr.dataclass(frozen=True)
+class LiveFailure:
+    envname: str
+    test_id: str
+    message: str
+
+
+class JsonLinesTail:
+    """Follows the failures ``checkon_live`` appends to a file for pytest."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.offset = 0
+
+    def poll(self) -> t.List[LiveFailure]:
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        # Leave a partly written line for the next poll.
+        data = data[: data.rfind(b"\n") + 1]
+        self.offset += len(data)
+        failures = []
+        for line in data.splitlines():
+            record = json.loads(line)
+            failures.append(
+                LiveFailure(
+                    envname=self.path.parent.name,
+                    test_id=record["nodeid"],
+                    message=record["message"],
+                )
+            )
+        return failures
+
+
+class SubunitTail:
+    """Follows the failures in a subunit v2 stream, such as trial's."""
+
+    def __init__(self, path: pathlib.Path):
+        self.path = path
+        self.offset = 0
+        self.attachments: t.Dict[str, t.List[bytes]] = {}
+
+    def poll(self) -> t.List[LiveFailure]:
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            stream = io.BytesIO(f.read())
+        failures = []
+        consumed = 0
+        for packet in results.iter_subunit(stream):
+            # A partly written packet is left for the next poll.
+            consumed = stream.tell()
+            if packet.test_id is None:
+                continue
+            if packet.file_name is not None:
+                self.attachments.setdefault(packet.test_id, []).append(
+                    packet.file_bytes
+                )
+            if packet.status is None or packet.status == "inprogress":
+                continue
+            failure = results.subunit_failure(
+                packet, self.attachments.pop(packet.test_id, [])
+            )
+            if failure is not None:
+                failures.append(
+                    LiveFailure(
+                        envname=self.path.parent.name,
+                        test_id=packet.test_id,
+                        message=failure.message,
+                    )
+                )
+        self.offset += consumed
+        return failures
+
+
+class Follower:
+    """Prints the failures of a dependent's toxenvs as they happen.
+
+    Each failure is spent from ``budget``. Called as the ``abort`` of
+    `checkon.limits.run`, it kills the tox session once the budget is exhausted.
+    Several sessions of one dependent may call it at once.
+    """
+
+    def __init__(self, url: str, results_dir: pathlib.Path, budget: FailureBudget):
+        self.url = url
+        self.results_dir = results_dir
+        self.budget = budget
+        self.tails: t.Dict[pathlib.Path, t.Union[JsonLinesTail, SubunitTail]] = {}
+        self.lock = threading.Lock()
+
+    @property
+    def exhausted(self) -> bool:
+        return self.budget.exhausted
+
+    def poll(self) -> t.List[LiveFailure]:
+        with self.lock:
+            for pattern, tail_class in [
+                (LIVE_GLOB, JsonLinesTail),
+                (SUBUNIT_GLOB, SubunitTail),
+            ]:
+                for path in self.results_dir.glob(f"*/{pattern}"):
+                    if path not in self.tails:
+                        self.tails[path] = tail_class(path)
+            failures = [
+                failure for tail in self.tails.values() for failure in tail.poll()
+            ]
+        for failure in failures:
+            print(f"{self.url} {failure.envname}: FAILED {failure.test_id}")
+            # pytest's messages can run on for many lines.
+            print("    " + failure.message.partition("\n")[0])
+        self.budget.spend(len(failures))
+        return failures
+
+    def __call__(self) -> t.Optional[str]:
+        self.poll()
+        if self.exhausted:
+            return "failures"
+        return None
@@ -0,0 +1,75 @@
+"""Bare mirrors of dependent repositories, kept between runs."""
+import hashlib
+import pathlib
+import shutil
+import subprocess
+import tempfile
+
+
+MIRRORS_DIR = pathlib.Path("/tmp/checkon/mirrors")
+
+
+def mirror_path(url) -> pathlib.Path:
+    digest = hashlib.sha256(str(url).encode()).hexdigest()[:16]
+    return MIRRORS_DIR / f"{digest}.git"
+
+
+def update(url, streams=None) -> pathlib.Path:
+    """Fetch ``url`` into its mirror, cloning it on first use.
+
+    The first clone is partial: blobs are fetched on demand by the checkouts
+    that need them, which keeps large histories cheap.
+    """
+    streams = streams or {}
+    path = mirror_path(url)
+    if path.exists():
+        subprocess.run(
+            ["git", "--git-dir", str(path), "fetch", "--prune", "origin"],
+            check=True,
+            **streams,
+        )
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    clone_dir = pathlib.Path(tempfile.mkdtemp(dir=path.parent, suffix=".tmp"))
+    subprocess.run(
+        ["git", "clone", "--mirror", "--filter=blob:none", str(url), str(clone_dir)],
+        check=True,
+        **streams,
+    )
+    try:
+        clone_dir.rename(path)
+    except OSError:
+        # Someone else mirrored the same url in the meantime.
+        shutil.rmtree(clone_dir)
+    return path
+
+
+def head(mirror: pathlib.Path) -> str:
+    return (
+        subprocess.check_output(["git", "--git-dir", str(mirror), "rev-parse", "HEAD"])
+        .decode()
+        .strip()
+    )
+
+
+def checkout(mirror: pathlib.Path, rev: str, path: pathlib.Path, streams=None):
+    """Check out ``rev`` into a worktree at ``path``."""
+    streams = streams or {}
+    subprocess.run(
+        ["git", "--git-dir", str(mirror), "worktree", "prune"], check=True, **streams
+    )
+    subprocess.run(
+        [
+            "git",
+            "--git-dir",
+            str(mirror),
+            "worktree",
+            "add",
+            "--detach",
+            str(path),
+            rev,
+        ],
+        check=True,
+        **streams,
+    )
@@ -1,50 +1,275 @@
+import concurrent.futures
 import datetime
+import io
 import json
+import os
 import pathlib
+import pickle
+import struct
+import sys
+import tempfile
 import textwrap
 import typing as t
+import xml.etree.ElementTree
+import zlib
 
 import attr
 import dataclasses
-import marshmallow
-import marshmallow_dataclass
-import pyrsistent
-import xmltodict
 
+import checkon.limits
 import checkon.tox
 
 
-@dataclasses.dataclass(frozen=True)
+# Bump this when the result classes change, to drop pickles of the old ones.
+CACHE_VERSION = 2
+CACHE_NAME = "parsed.pickle"
+
+
+def intern(string: t.Optional[str]) -> t.Optional[str]:
+    return None if string is None else sys.intern(string)
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
 class Failure:
     message: str
-    lines: t.List[str]
+    text: str
+
+    @property
+    def lines(self) -> t.List[str]:
+        return self.text.splitlines()
 
     @classmethod
     def from_dict(cls, data):
-        return cls(**pyrsistent.freeze(data))
+        if "lines" in data:
+            data = {"message": data["message"], "text": "".join(data["lines"])}
+        return cls(**data)
 
 
-class FailureField(marshmallow.fields.Field):
-    def _deserialize(self, value, attr, data, **kw):
-        if isinstance(value, list):
-            [value] = value
-
-            return Failure(**value)
-        return None
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class TestCaseRun:
+    """One test case of a suite run.
 
+    Many of these are held at once, so they are slotted and share their classname
+    and file strings with the other cases of their module.
+    """
 
-@dataclasses.dataclass(frozen=True)
-class TestCaseRun:
     name: str
     classname: str
-    file: str
-    line: int
-    time: str  # TODO pendulum
-    failure: t.Optional[Failure] = dataclasses.field(
-        metadata={"marshmallow_field": FailureField()}, default=None
+    file: t.Optional[str]
+    line: t.Optional[int]
+    time: t.Optional[float]
+    failure: t.Optional[Failure] = None
+
+    @classmethod
+    def from_element(cls, element):
+        failure = element.find("failure")
+        if failure is None:
+            # pytest reports errors in fixtures, setup and teardown as such.
+            failure = element.find("error")
+        if failure is not None:
+            failure = Failure(
+                message=failure.get("message", ""), text=failure.text or ""
+            )
+        line = element.get("line")
+        time = element.get("time")
+        return cls(
+            name=element.get("name"),
+            classname=intern(element.get("classname")),
+            file=intern(element.get("file")),
+            line=None if line is None else int(line),
+            time=None if time is None else float(time),
+            failure=failure,
+        )
+
+
+def iter_junit(
+    source
+) -> t.Iterator[t.Tuple[t.Dict[str, str], t.Iterator[TestCaseRun]]]:
+    """Stream the suites of a JUnit XML file, like `itertools.groupby`.
+
+    Yields each suite's attributes with an iterator of its test cases, which must be
+    consumed before moving on to the next suite. Each case is dropped from the
+    parse tree once built, so memory stays flat however large the suite.
+    """
+    events = xml.etree.ElementTree.iterparse(source, events=("start", "end"))
+    for event, element in events:
+        if event == "start" and element.tag == "testsuite":
+            cases = _iter_suite_cases(events, element)
+            yield dict(element.attrib), cases
+            # Skip whatever the caller did not consume.
+            for _ in cases:
+                pass
+
+
+def _iter_suite_cases(events, suite) -> t.Iterator[TestCaseRun]:
+    for event, element in events:
+        if event != "end":
+            continue
+        if element.tag == "testcase":
+            yield TestCaseRun.from_element(element)
+            # The suite's attributes were copied at its start, so they can go too.
+            suite.clear()
+        elif element.tag == "testsuite":
+            suite.clear()
+            return
+
+
+def iter_test_cases(source) -> t.Iterator[TestCaseRun]:
+    """Stream the test cases of a JUnit XML file, across all its suites."""
+    for _, cases in iter_junit(source):
+        yield from cases
+
+
+SUBUNIT_SIGNATURE = 0xB3
+SUBUNIT_VERSION = 0x2000
+SUBUNIT_STATUSES = [
+    None,
+    "exists",
+    "inprogress",
+    "success",
+    "uxsuccess",
+    "skip",
+    "fail",
+    "xfail",
+]
+SUBUNIT_FAILED = {"fail", "uxsuccess"}
+
+
+@attr.s(auto_attribs=True, frozen=True, slots=True)
+class SubunitPacket:
+    """One event of a subunit v2 stream, with the fields checkon reads."""
+
+    test_id: t.Optional[str]
+    status: t.Optional[str]
+    timestamp: t.Optional[datetime.datetime]
+    file_name: t.Optional[str]
+    file_bytes: bytes
+
+
+def _read_varint(data: bytes, offset: int) -> t.Tuple[int, int]:
+    """Read a subunit varint: the top two bits of its first byte say how many follow."""
+    size = (data[offset] >> 6) + 1
+    value = int.from_bytes(data[offset : offset + size], "big")
+    return value & ~(0xC0 << 8 * (size - 1)), offset + size
+
+
+def _read_string(data: bytes, offset: int) -> t.Tuple[str, int]:
+    length, offset = _read_varint(data, offset)
+    return data[offset : offset + length].decode(), offset + length
+
+
+def iter_subunit(stream: t.BinaryIO) -> t.Iterator[SubunitPacket]:
+    """Stream the packets of a subunit v2 stream.
+
+    Bytes between packets, like stray output in the stream, are skipped, and so are
+    packets that fail their checksum.
+    """
+    while True:
+        signature = stream.read(1)
+        if not signature:
+            return
+        if signature[0] != SUBUNIT_SIGNATURE:
+            continue
+        header = stream.read(3)
+        if len(header) < 3:
+            return
+        [flags] = struct.unpack(">H", header[:2])
+        if flags & 0xF000 != SUBUNIT_VERSION:
+            continue
+        # The length covers the whole packet, from the signature to the checksum.
+        size = (header[2] >> 6) + 1
+        header += stream.read(size - 1)
+        length, _ = _read_varint(header, 2)
+        packet = signature + header + stream.read(length - 1 - len(header))
+        if len(packet) < length:
+            return
+        [checksum] = struct.unpack(">I", packet[-4:])
+        if zlib.crc32(packet[:-4]) != checksum:
+            continue
+        yield _parse_subunit_packet(flags, packet[:-4], 3 + size)
+
+
+def _parse_subunit_packet(flags: int, data: bytes, offset: int) -> SubunitPacket:
+    timestamp = test_id = file_name = None
+    file_bytes = b""
+    if flags & 0x0200:
+        [seconds] = struct.unpack(">I", data[offset : offset + 4])
+        nanoseconds, offset = _read_varint(data, offset + 4)
+        timestamp = datetime.datetime.fromtimestamp(
+            seconds, datetime.timezone.utc
+        ) + datetime.timedelta(microseconds=nanoseconds // 1000)
+    if flags & 0x0800:
+        test_id, offset = _read_string(data, offset)
+    if flags & 0x0080:
+        count, offset = _read_varint(data, offset)
+        for _ in range(count):
+            _, offset = _read_string(data, offset)
+    if flags & 0x0040:
+        _, offset = _read_string(data, offset)
+    if flags & 0x0020:
+        file_name, offset = _read_string(data, offset)
+        length, offset = _read_varint(data, offset)
+        file_bytes = data[offset : offset + length]
+    return SubunitPacket(
+        test_id=test_id,
+        status=SUBUNIT_STATUSES[flags & 0x0007],
+        timestamp=timestamp,
+        file_name=file_name,
+        file_bytes=file_bytes,
     )
 
 
+def subunit_failure(
+    packet: SubunitPacket, attachments: t.List[bytes]
+) -> t.Optional[Failure]:
+    """The failure a test's final packet reports, from the attachments sent before it.
+
+    The message is the last line of the traceback, as pytest's would be.
+    """
+    if packet.status not in SUBUNIT_FAILED:
+        return None
+    text = b"".join(attachments).decode(errors="replace")
+    lines = text.strip().splitlines()
+    return Failure(message=lines[-1] if lines else packet.status, text=text)
+
+
+def iter_subunit_cases(
+    packets: t.Iterable[SubunitPacket]
+) -> t.Iterator[t.Tuple[TestCaseRun, SubunitPacket]]:
+    """Gather subunit packets into test cases, with the packet that ended each.
+
+    A test's attachments are only kept as failure text when it fails.
+    """
+    starts = {}
+    attachments = {}
+    for packet in packets:
+        if packet.test_id is None:
+            continue
+        if packet.file_name is not None:
+            attachments.setdefault(packet.test_id, []).append(packet.file_bytes)
+        if packet.status == "inprogress":
+            starts[packet.test_id] = packet.timestamp
+        if packet.status not in SUBUNIT_FAILED | {"success", "skip", "xfail"}:
+            continue
+
+        start = starts.pop(packet.test_id, None)
+        failure = subunit_failure(packet, attachments.pop(packet.test_id, []))
+        classname, _, name = packet.test_id.rpartition(".")
+        test_case = TestCaseRun(
+            name=name,
+            classname=intern(classname),
+            file=None,
+            line=None,
+            time=(
+                (packet.timestamp - start).total_seconds()
+                if start is not None and packet.timestamp is not None
+                else None
+            ),
+            failure=failure,
+        )
+        yield test_case, packet
+
+
 @attr.dataclass(frozen=True)
 @dataclasses.dataclass(frozen=True)
 class TestSuiteRun:
@@ -63,23 +288,62 @@ class TestSuiteRun:
 
     @classmethod
     def from_bytes(cls, data, envname):
-        schema = marshmallow_dataclass.class_schema(cls)(many=True)
-        parsed = xmltodict.parse(
-            data,
-            attr_prefix="",
-            dict_constructor=dict,
-            force_list=True,
-            cdata_key="lines",
-        )
-
-        [suite] = parsed["testsuites"]
+        return [
+            cls.from_attributes(attributes, list(cases), envname)
+            for attributes, cases in iter_junit(io.BytesIO(data))
+        ]
 
-        return schema.load([{**ts, "envname": envname} for ts in suite["testsuite"]])
+    @classmethod
+    def from_attributes(cls, attributes, test_cases, envname):
+        return cls(
+            errors=int(attributes.get("errors", 0)),
+            failures=int(attributes.get("failures", 0)),
+            skipped=int(attributes.get("skipped", 0)),
+            tests=int(attributes.get("tests", 0)),
+            time=attributes.get("time"),
+            timestamp=(
+                datetime.datetime.fromisoformat(attributes["timestamp"])
+                if "timestamp" in attributes
+                else None
+            ),
+            hostname=attributes.get("hostname"),
+            name=attributes.get("name"),
+            test_cases=test_cases,
+            envname=envname,
+        )
 
     @classmethod
     def from_path(cls, path):
-        envname = path.parent.name
-        return cls.from_bytes(pathlib.Path(path).read_bytes(), envname=envname)
+        envname = pathlib.Path(path).parent.name
+        return [
+            cls.from_attributes(attributes, list(cases), envname)
+            for attributes, cases in iter_junit(str(path))
+        ]
+
+    @classmethod
+    def from_subunit_path(cls, path):
+        """Load a subunit v2 stream as one suite."""
+        test_cases = []
+        skipped = 0
+        first = last = None
+        with open(path, "rb") as f:
+            for test_case, packet in iter_subunit_cases(iter_subunit(f)):
+                test_cases.append(test_case)
+                skipped += packet.status == "skip"
+                first = first or packet.timestamp
+                last = packet.timestamp or last
+        return cls(
+            errors=0,
+            failures=sum(case.failure is not None for case in test_cases),
+            skipped=skipped,
+            tests=len(test_cases),
+            time=str((last - first).total_seconds()) if first and last else None,
+            timestamp=first,
+            hostname=None,
+            name="subunit",
+            test_cases=test_cases,
+            envname=pathlib.Path(path).parent.name,
+        )
 
 
 @attr.dataclass(frozen=True)
@@ -89,15 +353,80 @@ class ToxTestSuiteRun:
     suite: TestSuiteRun
     tox_run: checkon.tox.ToxRun
     envname: str
+    usage: t.Optional[checkon.limits.Usage] = None
+
+    @classmethod
+    def from_dir(cls, toxenv_dir, use_cache: bool = True):
+        """Load a toxenv result directory.
+
+        The parsed result is pickled into the directory, and reused for as long as
+        the files it came from keep their size and modification time.
+        """
+        toxenv_dir = pathlib.Path(toxenv_dir)
+        if not use_cache:
+            return cls.parse_dir(toxenv_dir)
+
+        key = source_key(toxenv_dir)
+        cache_path = toxenv_dir / CACHE_NAME
+        try:
+            with open(cache_path, "rb") as f:
+                cached_key, run = pickle.load(f)
+        except Exception:
+            # Missing, partly written, or pickled from classes that have changed.
+            pass
+        else:
+            if cached_key == key:
+                return run
+
+        run = cls.parse_dir(toxenv_dir)
+        write_cache(cache_path, key, run)
+        return run
 
     @classmethod
-    def from_dir(cls, toxenv_dir):
-        [path] = toxenv_dir.glob("test_*.xml")
-        [suite] = TestSuiteRun.from_path(path)
+    def parse_dir(cls, toxenv_dir):
+        xml_paths = list(toxenv_dir.glob("test_*.xml"))
+        if xml_paths:
+            [path] = xml_paths
+            [suite] = TestSuiteRun.from_path(path)
+        else:
+            # trial writes subunit v2 in place of JUnit XML.
+            [path] = toxenv_dir.glob("test_*.subunit")
+            suite = TestSuiteRun.from_subunit_path(path)
 
         [tox_data_path] = toxenv_dir.glob("tox_*.json")
         tox_run = checkon.tox.ToxRun.from_path(tox_data_path)
-        return cls(suite, tox_run=tox_run, envname=toxenv_dir.name)
+
+        usage = None
+        usage_path = toxenv_dir / f"usage_{toxenv_dir.name}.json"
+        if usage_path.exists():
+            usage = checkon.limits.Usage.from_path(usage_path)
+        return cls(suite, tox_run=tox_run, envname=toxenv_dir.name, usage=usage)
+
+
+def source_key(toxenv_dir: pathlib.Path) -> t.Tuple:
+    """What a cached parse of ``toxenv_dir`` is only valid for."""
+    sources = []
+    for pattern in ["test_*.xml", "test_*.subunit", "tox_*.json", "usage_*.json"]:
+        for path in toxenv_dir.glob(pattern):
+            stat = path.stat()
+            sources.append((path.name, stat.st_mtime_ns, stat.st_size))
+    return (CACHE_VERSION, *sorted(sources))
+
+
+def write_cache(path: pathlib.Path, key: t.Tuple, run: ToxTestSuiteRun):
+    try:
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    except OSError:
+        # Read-only results are loaded without a cache.
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, run), f, protocol=pickle.HIGHEST_PROTOCOL)
+        # Readers see either the old pickle or the new one, never half of one.
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
 
 
 @attr.dataclass(frozen=True)
@@ -106,14 +435,63 @@ class DependentResult:
     suite_runs: t.List[ToxTestSuiteRun]
 
     @classmethod
-    def from_dir(cls, output_dir, url):
-        runs = []
-        for dir in pathlib.Path(output_dir).glob("*"):
-            if not dir.is_dir():
-                continue
-            runs.append(ToxTestSuiteRun.from_dir(dir))
+    def from_dir(cls, output_dir, url, jobs: int = 1):
+        """Load the results of a dependent, parsing ``jobs`` toxenvs at a time.
+
+        With more than one job, the toxenvs are parsed in a process pool.
+        """
+        if jobs == 1:
+            return cls(
+                url=url,
+                suite_runs=[
+                    ToxTestSuiteRun.from_dir(dir) for dir in toxenv_dirs(output_dir)
+                ],
+            )
+
+        [result] = cls.from_dirs({url: output_dir}, jobs=jobs).values()
+        return result
 
-        return cls(url=url, suite_runs=runs)
+    @classmethod
+    def from_dirs(
+        cls, url_to_dir: t.Mapping[str, pathlib.Path], jobs: t.Optional[int] = None
+    ) -> t.Dict[str, "DependentResult"]:
+        """Load the results of many dependents, by url, in one process pool.
+
+        All their toxenvs share the pool, so a batch of small dependents keeps every
+        worker busy. ``jobs`` defaults to one per CPU; with one, there is no pool.
+        """
+        if jobs is None:
+            jobs = os.cpu_count()
+        if jobs == 1:
+            return {
+                url: cls.from_dir(output_dir, url)
+                for url, output_dir in url_to_dir.items()
+            }
+
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+            url_to_futures = {
+                url: [
+                    executor.submit(ToxTestSuiteRun.from_dir, dir)
+                    for dir in toxenv_dirs(output_dir)
+                ]
+                for url, output_dir in url_to_dir.items()
+            }
+            return {
+                url: cls(url=url, suite_runs=[future.result() for future in futures])
+                for url, futures in url_to_futures.items()
+            }
+
+
+def toxenv_dirs(output_dir) -> t.List[pathlib.Path]:
+    """The toxenv result directories in the results of a dependent."""
+    return [
+        dir
+        for dir in pathlib.Path(output_dir).glob("*")
+        # Skip other files, and envs killed before they wrote a report.
+        if dir.is_dir()
+        and (any(dir.glob("test_*.xml")) or any(dir.glob("test_*.subunit")))
+        and any(dir.glob("tox_*.json"))
+    ]
 
 
 @attr.dataclass(frozen=True)
@@ -122,24 +500,53 @@ class AppSuiteRun:
     dependent_result: DependentResult
 
 
-@attr.dataclass(frozen=True)
+@attr.s(auto_attribs=True, frozen=True, slots=True)
 class FailedTest:
     name: str
     classname: str
-    file: str
-    line: str
-    failure: t.Sequence[Failure] = attr.ib(converter=Failure.from_dict)
+    file: t.Optional[str]
+    line: t.Optional[int]
+    failure: Failure
 
     @classmethod
     def from_test_case(cls, test):
         return cls(
             **{
                 k: v
-                for k, v in dataclasses.asdict(test).items()
+                for k, v in attr.asdict(test, recurse=False).items()
                 if k in attr.fields_dict(FailedTest).keys()
             }
         )
 
+    @property
+    def node_id(self) -> t.Optional[str]:
+        """The pytest node id of the test.
+
+        The module part of ``classname`` is replaced by the file, so
+        ``tests.test_x.TestK`` in ``tests/test_x.py`` gives
+        ``tests/test_x.py::TestK::name``. xunit2 reports, pytest's default since 6.0,
+        have no file, so then the classes are the capitalized end of ``classname``,
+        as pytest's ``Test*`` classes are.
+        """
+        if not self.classname:
+            return None
+        file = self.file
+        if not file:
+            parts = self.classname.split(".")
+            while len(parts) > 1 and parts[-1][:1].isupper():
+                parts.pop()
+            file = "/".join(parts) + ".py"
+        if not file.endswith(".py"):
+            return None
+        module = file[: -len(".py")].replace("/", ".")
+        if self.classname == module:
+            classes = []
+        elif self.classname.startswith(module + "."):
+            classes = self.classname[len(module) + 1 :].split(".")
+        else:
+            return None
+        return "::".join([file, *classes, self.name])
+
 
 @attr.dataclass(frozen=True)
 class Comparison:
@@ -154,8 +561,7 @@ def format_suite_failures(requirement, test_cases):
         return "No failures\n"
 
     return "\n" + "\n".join(
-        case.failure.message + "\n" + "\n".join(case.failure.lines)
-        for case in test_cases
+        case.failure.message + "\n" + case.failure.text for case in test_cases
     )
 
 
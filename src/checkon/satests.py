@@ -1,9 +1,14 @@
+import collections
+import datetime
 import functools
+import hashlib
+import itertools
+import pathlib
 import typing as t
+import zlib
 
 import attr
 import inflection
-import pyrsistent
 import sqlalchemy as sa
 import sqlalchemy.ext.declarative
 import sqlalchemy.orm
@@ -28,20 +33,24 @@ def relation(cls=None, name=None):
             if isinstance(v, (sa.Column, sa.orm.relationships.RelationshipProperty))
         }
 
-        # Add the table name.
+        # Add the table name, and any constraints.
         mapping["__tablename__"] = table_name
+        if "__table_args__" in cls.__dict__:
+            mapping["__table_args__"] = cls.__table_args__
 
         # Add the primary key.
         mapping[table_name + "_id"] = sa.Column(
             sa.Integer, primary_key=True, autoincrement=True
         )
 
-        # Add the references.
+        # Add the references, indexed since queries join on them.
         for ref, v in cls.__dict__.items():
             if isinstance(v, sa.orm.relationships.RelationshipProperty):
                 foreign_name = inflection.underscore(v.argument)
                 mapping[f"{ref}_id"] = sa.Column(
-                    sa.Integer, sa.ForeignKey(f"{foreign_name}.{foreign_name}_id")
+                    sa.Integer,
+                    sa.ForeignKey(f"{foreign_name}.{foreign_name}_id"),
+                    index=True,
                 )
 
         return type(cls.__name__, (Base,), mapping)
@@ -56,6 +65,9 @@ def relation(cls=None, name=None):
 
 @relation
 class TestCase:
+    __table_args__ = (
+        sa.Index("uq_test_case", "name", "classname", "file", "line", unique=True),
+    )
 
     name = sa.Column(sa.String)
     classname = sa.Column(sa.String)
@@ -65,6 +77,10 @@ class TestCase:
 
 @relation
 class TestCaseRun:
+    # Diffs look up the run of a test in the other side's suite.
+    __table_args__ = (
+        sa.Index("ix_test_case_run_suite_case", "test_suite_run_id", "test_case_id"),
+    )
 
     duration = sa.Column(sa.String)
     test_case = sa.orm.relationship("TestCase", uselist=False)
@@ -72,17 +88,41 @@ class TestCaseRun:
     test_failure = sa.orm.relationship("TestFailure", uselist=False)
 
     test_suite_run_id = sa.Column(
-        sa.Integer, sa.ForeignKey("test_suite_run.test_suite_run_id")
+        sa.Integer, sa.ForeignKey("test_suite_run.test_suite_run_id"), index=True
     )
 
     test_suite_run = sa.orm.relationship("TestSuiteRun")
 
 
+class CompressedText(sa.types.TypeDecorator):
+    """Text stored compressed with zlib.
+
+    Text stored uncompressed, by databases from before this type, reads as is.
+    """
+
+    impl = sa.LargeBinary
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return zlib.compress(value.encode(), COMPRESSION_LEVEL)
+
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, str):
+            return value
+        return zlib.decompress(value).decode()
+
+
+COMPRESSION_LEVEL = 6
+
+
 @relation
 class FailureOutput:
+    """The output of a failure, stored once however many test runs fail with it."""
 
     message = sa.Column(sa.String)
-    text = sa.Column(sa.String)
+    text = sa.Column(CompressedText)
+    digest = sa.Column(sa.String, index=True, unique=True)
 
 
 @relation
@@ -134,8 +174,9 @@ class ToxRun(Base):
     tox_run_id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
 
     toxenv_runs = sa.orm.relationship("ToxenvRun", back_populates="tox_run")
-    provider = sa.Column(sa.String)
-    application = sa.Column(sa.String)
+    provider = sa.Column(sa.String, index=True)
+    application = sa.Column(sa.String, index=True)
+    start_time = sa.Column(sa.DateTime, index=True)
 
 
 @relation
@@ -145,7 +186,7 @@ class ToxenvRun:
     envname = sa.Column(sa.String)
     test_suite_run = sa.orm.relationship("TestSuiteRun", uselist=False)
     tox_run = sa.orm.relationship("ToxRun", back_populates="toxenv_runs")
-    tox_run_id = sa.Column(sa.Integer, sa.ForeignKey("tox_run.tox_run_id"))
+    tox_run_id = sa.Column(sa.Integer, sa.ForeignKey("tox_run.tox_run_id"), index=True)
 
 
 @relation
@@ -165,21 +206,219 @@ def singledispatch_method(func):
     return wrapper
 
 
+TEST_CASE_CACHE_SIZE = 100000
+FAILURE_OUTPUT_CACHE_SIZE = 10000
+
+
+class LRUCache:
+    """A mapping keeping only the ``maxsize`` most recently used keys."""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self.data = collections.OrderedDict()
+
+    def get(self, key, default=None):
+        try:
+            self.data.move_to_end(key)
+        except KeyError:
+            return default
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.data.move_to_end(key)
+        if len(self.data) > self.maxsize:
+            self.data.popitem(last=False)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+
+
+def test_case_key(case: checkon.results.TestCaseRun) -> t.Tuple:
+    """What identifies a `TestCase` row, as in its unique constraint."""
+    return (case.name, case.classname, case.file, case.line)
+
+
+def failure_digest(failure: checkon.results.Failure) -> str:
+    """What identifies a `FailureOutput` row: a hash of its content."""
+    digest = hashlib.sha256(failure.message.encode())
+    digest.update(b"\0" + failure.text.encode())
+    return digest.hexdigest()
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each SQLite connection for a results store written in large batches.
+
+    In WAL mode, readers don't block the writer, and commits only sync at
+    checkpoints, which `synchronous = NORMAL` makes safe.
+    """
+    cursor = dbapi_connection.cursor()
+    for pragma in [
+        "journal_mode = WAL",
+        "synchronous = NORMAL",
+        "busy_timeout = 10000",
+        "temp_store = MEMORY",
+        # In KiB when negative.
+        "cache_size = -65536",
+    ]:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+
+def schema_version(connection) -> int:
+    return connection.execute("PRAGMA user_version").scalar()
+
+
+def add_tox_run_start_time(connection):
+    connection.execute("ALTER TABLE tox_run ADD COLUMN start_time DATETIME")
+    connection.execute("CREATE INDEX ix_tox_run_start_time ON tox_run (start_time)")
+
+
+def add_failure_output_digest(connection):
+    # Outputs stored before are neither compressed nor deduplicated.
+    connection.execute("ALTER TABLE failure_output ADD COLUMN digest VARCHAR")
+    connection.execute(
+        "CREATE UNIQUE INDEX ix_failure_output_digest ON failure_output (digest)"
+    )
+
+
+def add_test_case_run_suite_case_index(connection):
+    connection.execute(
+        "CREATE INDEX ix_test_case_run_suite_case"
+        " ON test_case_run (test_suite_run_id, test_case_id)"
+    )
+
+
+def add_test_case_unique_index(connection):
+    # Databases from before it stored each run's test cases anew, so the runs of
+    # a test are moved to its first row and the others deleted.
+    connection.execute(
+        "CREATE INDEX ix_test_case_key ON test_case (name, classname, file, line)"
+    )
+    connection.execute(
+        "CREATE TEMP TABLE duplicate_test_case"
+        " (test_case_id INTEGER PRIMARY KEY, first_id INTEGER)"
+    )
+    connection.execute(
+        "INSERT INTO duplicate_test_case"
+        " SELECT test_case_id, ("
+        "  SELECT min(first.test_case_id) FROM test_case first"
+        "  WHERE first.name IS test_case.name"
+        "  AND first.classname IS test_case.classname"
+        "  AND first.file IS test_case.file"
+        "  AND first.line IS test_case.line"
+        " ) AS first_id"
+        " FROM test_case WHERE first_id != test_case_id"
+    )
+    connection.execute(
+        "UPDATE test_case_run SET test_case_id = ("
+        " SELECT first_id FROM duplicate_test_case"
+        " WHERE duplicate_test_case.test_case_id = test_case_run.test_case_id"
+        ") WHERE test_case_id IN (SELECT test_case_id FROM duplicate_test_case)"
+    )
+    connection.execute(
+        "DELETE FROM test_case"
+        " WHERE test_case_id IN (SELECT test_case_id FROM duplicate_test_case)"
+    )
+    connection.execute("DROP TABLE duplicate_test_case")
+    connection.execute("DROP INDEX ix_test_case_key")
+    connection.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_test_case"
+        " ON test_case (name, classname, file, line)"
+    )
+
+
+def add_reference_indexes(connection):
+    for name, table, columns in [
+        ("ix_test_case_run_test_case_id", "test_case_run", "test_case_id"),
+        ("ix_test_case_run_test_failure_id", "test_case_run", "test_failure_id"),
+        ("ix_test_case_run_test_suite_run_id", "test_case_run", "test_suite_run_id"),
+        ("ix_test_failure_failure_output_id", "test_failure", "failure_output_id"),
+        ("ix_test_suite_test_cases_id", "test_suite", "test_cases_id"),
+        ("ix_toxenv_application_id", "toxenv", "application_id"),
+        ("ix_tox_run_provider", "tox_run", "provider"),
+        ("ix_tox_run_application", "tox_run", "application"),
+        ("ix_toxenv_run_toxenv_id", "toxenv_run", "toxenv_id"),
+        ("ix_toxenv_run_test_suite_run_id", "toxenv_run", "test_suite_run_id"),
+        ("ix_toxenv_run_tox_run_id", "toxenv_run", "tox_run_id"),
+    ]:
+        connection.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+
+# Each migration upgrades a database from the version of its index to the next. A
+# new database is created at the last version; one from before versions is at 0.
+MIGRATIONS = [
+    add_tox_run_start_time,
+    add_failure_output_digest,
+    add_test_case_run_suite_case_index,
+    add_test_case_unique_index,
+    add_reference_indexes,
+]
+
+
+def database_url(path_or_url: str) -> str:
+    """A SQLAlchemy URL for ``path_or_url``, the path or URL of a SQLite database.
+
+    The schema version, the write lock and the report queries are SQLite's, so
+    other databases would be neither migrated nor queried correctly.
+    """
+    if "://" not in path_or_url:
+        return "sqlite:///" + str(pathlib.Path(path_or_url).resolve())
+    if not sa.engine.url.make_url(path_or_url).drivername.startswith("sqlite"):
+        raise ValueError(f"Not a SQLite database: {path_or_url}")
+    return path_or_url
+
+
 @attr.dataclass
 class Database:
+    """A satests database.
+
+    ``_cache`` maps `test_case_key` to the ids of recently used `TestCase` rows,
+    so repeated runs of a test refer to the same row. ``_output_cache`` does the
+    same for `FailureOutput` rows, by `failure_digest`.
+    """
+
     engine: t.Any
     session: t.Any
-    _cache: t.Dict = attr.ib(factory=dict)
+    _cache: LRUCache = attr.ib(factory=lambda: LRUCache(TEST_CASE_CACHE_SIZE))
+    _output_cache: LRUCache = attr.ib(
+        factory=lambda: LRUCache(FAILURE_OUTPUT_CACHE_SIZE)
+    )
 
     @classmethod
     def from_string(cls, connection_string="sqlite:///:memory:", echo=False):
-        engine = sa.create_engine(connection_string, echo=echo)
+        url = sa.engine.url.make_url(connection_string)
+        kw = {}
+        sqlite = url.drivername.startswith("sqlite")
+        if sqlite and url.database in (None, "", ":memory:"):
+            # Each connection would get its own empty database otherwise.
+            kw = dict(
+                poolclass=sa.pool.StaticPool, connect_args={"check_same_thread": False}
+            )
+        engine = sa.create_engine(url, echo=echo, **kw)
+        if sqlite:
+            sa.event.listen(engine, "connect", set_sqlite_pragmas)
         session = sa.orm.sessionmaker(bind=engine)()
         return cls(engine, session)
 
     def init(self):
+        """Create the tables, or migrate them to the current schema."""
         Base.metadata.bind = self.engine
-        Base.metadata.create_all()
+        with self.engine.begin() as connection:
+            if connection.dialect.name != "sqlite":
+                # Only SQLite keeps a schema version, so these are never migrated;
+                # `database_url` refuses them.
+                Base.metadata.create_all(connection)
+                return
+            fresh = not connection.dialect.has_table(connection, "tox_run")
+            Base.metadata.create_all(connection)
+            version = len(MIGRATIONS) if fresh else schema_version(connection)
+            for migration in MIGRATIONS[version:]:
+                migration(connection)
+            connection.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
 
     @singledispatch_method
     def transform(self, result: object):
@@ -225,25 +464,46 @@ class Database:
             if run.failure is None:
                 failure = None
             else:
-                failure = TestFailure(
-                    failure_output=FailureOutput(
-                        message=run.failure.message, text="".join(run.failure.lines)
-                    )
-                )
+                failure = TestFailure(failure_output=self.failure_output(run.failure))
             return TestCaseRun(
                 duration=run.time,
                 test_case=self.transform(run, cls=TestCase, testenv=testenv),
                 test_failure=failure,
             )
 
-        # Deduplicate using a cache.
-        args = pyrsistent.pmap(
-            dict(name=run.name, classname=run.classname, file=run.file, line=run.line)
+        # Get or create the test case, deduplicating with the cache.
+        key = test_case_key(run)
+        test_case_id = self._cache.get(key)
+        if test_case_id is not None:
+            return self.session.query(TestCase).get(test_case_id)
+        args = dict(
+            name=run.name, classname=run.classname, file=run.file, line=run.line
         )
-        key = (TestCase, args, testenv)
-        if key in self._cache:
-            return self._cache[key]
-        return TestCase(**args)
+        # `filter_by` compares None with IS NULL, which the unique constraint doesn't.
+        test_case = self.session.query(TestCase).filter_by(**args).one_or_none()
+        if test_case is None:
+            test_case = TestCase(**args)
+            self.session.add(test_case)
+            self.session.flush()
+        self._cache[key] = test_case.test_case_id
+        return test_case
+
+    def failure_output(self, failure: checkon.results.Failure) -> FailureOutput:
+        """Get or create the `FailureOutput` of ``failure``."""
+        digest = failure_digest(failure)
+        failure_output_id = self._output_cache.get(digest)
+        if failure_output_id is not None:
+            return self.session.query(FailureOutput).get(failure_output_id)
+        query = self.session.query(FailureOutput).filter_by(digest=digest)
+        output = query.one_or_none()
+        if output is None:
+            output = FailureOutput(
+                message=failure.message, text=failure.text, digest=digest
+            )
+            self.session.add(output)
+            self.session.flush()
+        self._output_cache[digest] = output.failure_output_id
+        return output
 
     @transform.register
     def _(self, run: checkon.results.AppSuiteRun):
@@ -256,12 +516,334 @@ class Database:
         return tox_run
 
 
-def insert_result(db: Database, result: checkon.results.DependentResult):
-    out = db.transform(result)
-    print(out)
-    # import pudb; pudb.set_trace()
-    db.session.add(out)
-    db.session.commit()
+BATCH_SIZE = 10000
+# Stay below SQLite's limit on the number of parameters in a statement.
+IN_CHUNK_SIZE = 500
+
+
+class BulkLoader:
+    """Rows of a result, flattened per table and inserted in ``executemany`` batches.
+
+    Ids are allocated up front from each table's largest, so rows can refer to
+    their parents without a round trip each. That only holds while one writer
+    inserts at a time, so ``connection`` should hold the write lock, as
+    `lock_for_writing` takes it.
+    """
+
+    # Parents first, so the rows referred to are always there.
+    tables = [
+        TestCase.__table__,
+        FailureOutput.__table__,
+        TestFailure.__table__,
+        ToxRun.__table__,
+        TestSuiteRun.__table__,
+        ToxenvRun.__table__,
+        TestCaseRun.__table__,
+    ]
+
+    def __init__(
+        self,
+        connection,
+        batch_size: int = BATCH_SIZE,
+        test_case_cache: t.Optional[LRUCache] = None,
+        output_cache: t.Optional[LRUCache] = None,
+    ):
+        self.connection = connection
+        self.batch_size = batch_size
+        if test_case_cache is None:
+            test_case_cache = LRUCache(TEST_CASE_CACHE_SIZE)
+        self.test_case_cache = test_case_cache
+        if output_cache is None:
+            output_cache = LRUCache(FAILURE_OUTPUT_CACHE_SIZE)
+        self.output_cache = output_cache
+        self.ids = {}
+        for table in self.tables:
+            [key] = table.primary_key
+            largest = connection.execute(sa.select([sa.func.max(key)])).scalar()
+            self.ids[table] = itertools.count((largest or 0) + 1)
+        self.rows = {table: [] for table in self.tables}
+        self.count = 0
+
+    def add(self, table: sa.Table, **row) -> int:
+        """Queue a row for ``table``, returning its id."""
+        [key] = table.primary_key
+        row[key.name] = row_id = next(self.ids[table])
+        self.rows[table].append(row)
+        if len(self.rows[table]) >= self.batch_size:
+            self.flush()
+        return row_id
+
+    def flush(self):
+        for table in self.tables:
+            rows = self.rows[table]
+            if rows:
+                self.connection.execute(table.insert(), rows)
+                self.count += len(rows)
+                rows.clear()
+
+    def test_case_ids(
+        self, cases: t.Sequence[checkon.results.TestCaseRun]
+    ) -> t.Dict[t.Tuple, int]:
+        """Get or create the `TestCase` rows of ``cases``, by `test_case_key`.
+
+        Keys missing from the cache are looked up by classname, a few queries for a
+        suite, and those still missing are queued for insertion.
+        """
+        key_to_id = {}
+        missing = set()
+        for case in cases:
+            key = test_case_key(case)
+            test_case_id = self.test_case_cache.get(key)
+            if test_case_id is None:
+                missing.add(key)
+            else:
+                key_to_id[key] = test_case_id
+        if not missing:
+            return key_to_id
+
+        # Rows queued earlier may have left the cache, so they must be found.
+        self.flush()
+        table = TestCase.__table__
+        classnames = {classname for _, classname, _, _ in missing}
+        conditions = [table.c.classname.is_(None)] if None in classnames else []
+        classnames = sorted(classnames - {None})
+        for start in range(0, max(len(classnames), 1), IN_CHUNK_SIZE):
+            chunk = classnames[start : start + IN_CHUNK_SIZE]
+            query = sa.select(
+                [
+                    table.c.test_case_id,
+                    table.c.name,
+                    table.c.classname,
+                    table.c.file,
+                    table.c.line,
+                ]
+            ).where(sa.or_(table.c.classname.in_(chunk), *conditions))
+            for test_case_id, *key in self.connection.execute(query):
+                key = tuple(key)
+                if key in missing:
+                    key_to_id[key] = test_case_id
+                    missing.discard(key)
+
+        for name, classname, file, line in missing:
+            key_to_id[name, classname, file, line] = self.add(
+                table, name=name, classname=classname, file=file, line=line
+            )
+        for key, test_case_id in key_to_id.items():
+            self.test_case_cache[key] = test_case_id
+        return key_to_id
+
+    def failure_output_ids(
+        self, failures: t.Sequence[checkon.results.Failure]
+    ) -> t.Dict[str, int]:
+        """Get or create the `FailureOutput` rows of ``failures``, by digest."""
+        digest_to_id = {}
+        missing = {}
+        for failure in failures:
+            digest = failure_digest(failure)
+            failure_output_id = self.output_cache.get(digest)
+            if failure_output_id is None:
+                missing[digest] = failure
+            else:
+                digest_to_id[digest] = failure_output_id
+        if not missing:
+            return digest_to_id
+
+        # Rows queued earlier may have left the cache, so they must be found.
+        self.flush()
+        table = FailureOutput.__table__
+        digests = sorted(missing)
+        for start in range(0, len(digests), IN_CHUNK_SIZE):
+            query = sa.select([table.c.failure_output_id, table.c.digest]).where(
+                table.c.digest.in_(digests[start : start + IN_CHUNK_SIZE])
+            )
+            for failure_output_id, digest in self.connection.execute(query):
+                digest_to_id[digest] = failure_output_id
+                del missing[digest]
+
+        for digest, failure in missing.items():
+            digest_to_id[digest] = self.add(
+                table, message=failure.message, text=failure.text, digest=digest
+            )
+        for digest, failure_output_id in digest_to_id.items():
+            self.output_cache[digest] = failure_output_id
+        return digest_to_id
+
+    def add_result(self, result: checkon.results.AppSuiteRun) -> int:
+        """Queue the rows of ``result``, returning the id of its `ToxRun`."""
+        start_times = [
+            suite_run.suite.timestamp
+            for suite_run in result.dependent_result.suite_runs
+            if suite_run.suite.timestamp is not None
+        ]
+        tox_run_id = self.add(
+            ToxRun.__table__,
+            application=result.dependent_result.url,
+            provider=result.injected,
+            start_time=min(start_times, default=None) or datetime.datetime.now(),
+        )
+        for suite_run in result.dependent_result.suite_runs:
+            self.add_suite_run(suite_run, tox_run_id)
+        return tox_run_id
+
+    def add_suite_run(self, run: checkon.results.ToxTestSuiteRun, tox_run_id: int):
+        suite = run.suite
+        test_suite_run_id = self.add(
+            TestSuiteRun.__table__,
+            duration=suite.time,
+            start_time=suite.timestamp,
+            envname=suite.envname,
+        )
+        self.add(
+            ToxenvRun.__table__,
+            start_time=suite.timestamp,
+            envname=run.envname,
+            test_suite_run_id=test_suite_run_id,
+            tox_run_id=tox_run_id,
+        )
+        key_to_id = self.test_case_ids(suite.test_cases)
+        digest_to_id = self.failure_output_ids(
+            [case.failure for case in suite.test_cases if case.failure is not None]
+        )
+        for case in suite.test_cases:
+            test_failure_id = None
+            if case.failure is not None:
+                test_failure_id = self.add(
+                    TestFailure.__table__,
+                    failure_output_id=digest_to_id[failure_digest(case.failure)],
+                )
+            self.add(
+                TestCaseRun.__table__,
+                duration=case.time,
+                test_case_id=key_to_id[test_case_key(case)],
+                test_failure_id=test_failure_id,
+                test_suite_run_id=test_suite_run_id,
+            )
+
+
+def insert_result(
+    db: Database,
+    result: t.Union[checkon.results.AppSuiteRun, checkon.results.DependentResult],
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Insert ``result`` in one transaction, bypassing the ORM.
+
+    A `DependentResult` is inserted without a provider. Returns the id of the
+    `ToxRun` inserted.
+    """
+    [tox_run_id] = insert_results(db, [result], batch_size)
+    return tox_run_id
+
+
+def lock_for_writing(connection):
+    """Take the write lock for the rest of ``connection``'s transaction.
+
+    pysqlite only begins a transaction at the first write, so another writer
+    could otherwise read the same largest ids before either inserts.
+    """
+    if connection.dialect.name == "sqlite":
+        connection.execute("BEGIN IMMEDIATE")
+
+
+def insert_results(
+    db: Database,
+    results: t.Sequence[
+        t.Union[checkon.results.AppSuiteRun, checkon.results.DependentResult]
+    ],
+    batch_size: int = BATCH_SIZE,
+) -> t.List[int]:
+    """Insert ``results`` in one transaction, as `insert_result` does each."""
+    try:
+        with db.engine.begin() as connection:
+            lock_for_writing(connection)
+            loader = BulkLoader(connection, batch_size, db._cache, db._output_cache)
+            tox_run_ids = []
+            for result in results:
+                if isinstance(result, checkon.results.DependentResult):
+                    result = checkon.results.AppSuiteRun(
+                        injected=None, dependent_result=result
+                    )
+                tox_run_ids.append(loader.add_result(result))
+            loader.flush()
+    except Exception:
+        # The rows cached by the rolled back transaction are gone.
+        db._cache.clear()
+        db._output_cache.clear()
+        raise
+    return tox_run_ids
+
+
+def stream_rows(db: Database, statement, **params) -> t.Iterator[t.Dict[str, t.Any]]:
+    """The rows of ``statement`` as dicts, fetched from the database as they are read.
+
+    SQLite steps through the result as it is read, rather than buffering it.
+    """
+    with db.engine.connect() as connection:
+        rows = connection.execute(statement, **params)
+        for row in rows:
+            yield dict(row)
+
+
+FAILURE_HISTORY_QUERY = """
+SELECT
+    tr.start_time,
+    tr.application,
+    tr.provider,
+    ter.envname,
+    tc.classname,
+    tc.name,
+    tcr.test_failure_id IS NOT NULL AS failed,
+    fo.message
+FROM test_case tc
+JOIN test_case_run tcr ON tcr.test_case_id = tc.test_case_id
+JOIN toxenv_run ter ON ter.test_suite_run_id = tcr.test_suite_run_id
+JOIN tox_run tr ON tr.tox_run_id = ter.tox_run_id
+LEFT JOIN test_failure tf ON tf.test_failure_id = tcr.test_failure_id
+LEFT JOIN failure_output fo ON fo.failure_output_id = tf.failure_output_id
+WHERE tc.name = :name
+    AND (:classname IS NULL OR tc.classname = :classname)
+    AND (:application IS NULL OR tr.application = :application)
+ORDER BY tr.start_time, tr.tox_run_id, ter.envname
+"""
+
+
+PASS_RATE_QUERY = """
+SELECT
+    tr.start_time,
+    tr.application,
+    tr.provider,
+    count(*) AS tests,
+    count(tcr.test_failure_id) AS failures,
+    1.0 - 1.0 * count(tcr.test_failure_id) / count(*) AS pass_rate
+FROM tox_run tr
+JOIN toxenv_run ter ON ter.tox_run_id = tr.tox_run_id
+JOIN test_case_run tcr ON tcr.test_suite_run_id = ter.test_suite_run_id
+WHERE :application IS NULL OR tr.application = :application
+GROUP BY tr.tox_run_id
+ORDER BY tr.application, tr.start_time, tr.tox_run_id
+"""
+
+
+def failure_history(
+    db: Database,
+    name: str,
+    classname: t.Optional[str] = None,
+    application: t.Optional[str] = None,
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    """Each run of the tests called ``name``, oldest first, and whether it failed."""
+    return stream_rows(
+        db,
+        sa.text(FAILURE_HISTORY_QUERY),
+        name=name,
+        classname=classname,
+        application=application,
+    )
+
+
+def pass_rates(
+    db: Database, application: t.Optional[str] = None
+) -> t.Iterator[t.Dict[str, t.Any]]:
+    """The pass rate of each run of each dependent, oldest first."""
+    return stream_rows(db, sa.text(PASS_RATE_QUERY), application=application)
 
 
 def compare(db):
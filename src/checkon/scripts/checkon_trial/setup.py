@@ -3,9 +3,9 @@ import setuptools
 
 setuptools.setup(
     name="checkon-trial",
-    description="Patch for trial to ensure subunit reporting.",
-    version="0.0.2",
+    description="Patch for trial to report subunit v2 for checkon.",
+    version="0.1.0",
     packages=["checkon_trial"],
     entry_points={"console_scripts": ["trial = checkon_trial.checkon_trial:run"]},
-    install_requires=["python-subunit", "twisted", "junitxml"],
+    install_requires=["python-subunit", "testtools", "twisted"],
 )
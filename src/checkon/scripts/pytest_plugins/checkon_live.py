@@ -0,0 +1,26 @@
+"""pytest plugin appending each failure to the file at ``$CHECKON_LIVE`` as it happens.
+
+Each failure is a line of JSON, written whole, so checkon can follow a run while it
+runs and abort it once too many tests fail.
+"""
+import json
+import os
+
+
+def pytest_runtest_logreport(report):
+    path = os.environ.get("CHECKON_LIVE")
+    if not path or not report.failed:
+        return
+
+    crash = getattr(report.longrepr, "reprcrash", None)
+    if crash is not None:
+        message = crash.message
+    else:
+        lines = str(report.longrepr).strip().splitlines()
+        message = lines[-1] if lines else ""
+    line = json.dumps(
+        {"nodeid": report.nodeid, "when": report.when, "message": message}
+    )
+    # Appends of one line at a time don't interleave with other writers.
+    with open(path, "a") as f:
+        f.write(line + "\n")
@@ -0,0 +1,28 @@
+"""pytest plugin running only the tests listed in the file at ``$CHECKON_SELECT``.
+
+checkon puts this directory on ``PYTHONPATH`` and loads the plugin with
+``-p checkon_select`` when it reruns the failures of one side of a comparison.
+``checkon_live`` beside it is loaded the same way.
+"""
+import os
+
+
+def pytest_collection_modifyitems(config, items):
+    path = os.environ.get("CHECKON_SELECT")
+    if not path:
+        return
+
+    with open(path) as f:
+        node_ids = {line.strip() for line in f if line.strip()}
+
+    selected = []
+    deselected = []
+    for item in items:
+        if item.nodeid in node_ids:
+            selected.append(item)
+        else:
+            deselected.append(item)
+
+    if deselected:
+        config.hook.pytest_deselected(items=deselected)
+        items[:] = selected
@@ -1,3 +1,6 @@
+import collections.abc
+import functools
+import json
 import typing as t
 
 import attr
@@ -55,19 +58,63 @@ class TestEnv:
         cls(**data, name=name)
 
 
+@functools.lru_cache(maxsize=None)
+def schema_for(cls, exclude: t.Tuple[str, ...] = ()):
+    """A schema for ``cls``, built once, since building one costs more than loading."""
+    return marshmallow_dataclass.class_schema(cls)(exclude=exclude)
+
+
+class TestEnvs(collections.abc.Mapping):
+    """The testenvs of a tox run by name, each decoded from its JSON when first used.
+
+    Listing the envs costs nothing, so callers that only want their names never pay
+    for decoding the install logs and test output.
+    """
+
+    def __init__(self, raw: t.Dict[str, dict]):
+        self._raw = raw
+        self._decoded = {}
+
+    def __getitem__(self, name: str) -> TestEnv:
+        try:
+            return self._decoded[name]
+        except KeyError:
+            pass
+        testenv = schema_for(TestEnv).load({**self._raw[name], "name": name})
+        self._decoded[name] = testenv
+        return testenv
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    def __len__(self):
+        return len(self._raw)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({list(self._raw)!r})"
+
+
+def to_testenvs(testenvs: t.Mapping[str, t.Any]) -> TestEnvs:
+    """Wrap raw testenvs, passing ones already wrapped, as by `attr.evolve`, as is."""
+    if isinstance(testenvs, TestEnvs):
+        return testenvs
+    return TestEnvs(testenvs)
+
+
 @attr.s(auto_attribs=True, frozen=True)
 class ToxRun:
     toxversion: str
     commands: t.List[t.Any] = attr.ib(converter=pyrsistent.freeze)
     platform: str
     host: str
-    testenvs: t.Dict[str, TestEnv] = attr.ib(
-        converter=lambda d: {k: attr.evolve(v, name=k) for k, v in d.items()}
-    )
     reportversion: str
+    testenvs: t.Dict[str, TestEnv] = attr.ib(factory=dict, converter=to_testenvs)
 
     @classmethod
     def from_path(cls, path):
-        schema = marshmallow_dataclass.class_schema(cls)()
+        """Load a ``tox --result-json`` file, leaving its testenvs undecoded."""
         with open(path) as f:
-            return schema.loads(f.read())
+            data = json.load(f)
+        testenvs = data.pop("testenvs", {})
+        run = schema_for(cls, exclude=("testenvs",)).load(data)
+        return attr.evolve(run, testenvs=testenvs)
@@ -0,0 +1,49 @@
+"""tox plugin injecting the provider and running checkon's tests in one tox session.
+
+It does nothing unless ``CHECKON_INJECT`` is set, which `checkon.app.run_single_pass`
+does for the tox session it starts.
+"""
+import json
+import os
+import pathlib
+
+import tox
+
+
+@tox.hookimpl
+def tox_configure(config):
+    if "CHECKON_INJECT" not in os.environ:
+        return
+
+    from checkon import app
+
+    inject_command = json.loads(os.environ["CHECKON_INJECT"])
+    results_dir = pathlib.Path(os.environ["CHECKON_RESULTS_DIR"])
+
+    skip = json.loads(os.environ.get("CHECKON_SKIP", "[]"))
+    select = json.loads(os.environ.get("CHECKON_NODE_IDS", "null"))
+    follow = json.loads(os.environ.get("CHECKON_FOLLOW", "false"))
+    config.envlist = [
+        envname
+        for envname in app.select_envnames(
+            config.envlist, os.environ.get("CHECKON_TOXENV", "")
+        )
+        if envname not in skip and (select is None or envname in select)
+    ]
+    for envname in config.envlist:
+        envconfig = config.envconfigs[envname]
+        output_dir = results_dir / envname
+        output_dir.mkdir(exist_ok=True, parents=True)
+        test_output_file = output_dir / f"test_{envname}.xml"
+
+        plugin_env, plugin_addopts = app.pytest_plugins(
+            output_dir, None if select is None else select[envname], follow
+        )
+        for key, value in plugin_env.items():
+            envconfig.setenv[key] = value
+        envconfig.setenv["PYTEST_ADDOPTS"] = " ".join(
+            filter(None, [app.junit_addopts(test_output_file), plugin_addopts])
+        )
+        envconfig.setenv["JUNITXML_PATH"] = str(test_output_file)
+        # tox resolves the executable in place, so each env needs its own copy.
+        envconfig.commands_pre = [list(inject_command), *envconfig.commands_pre]
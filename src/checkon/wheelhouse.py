@@ -0,0 +1,124 @@
+"""Wheels of the injected requirement and the trial patch, built once per run."""
+import contextlib
+import hashlib
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import typing as t
+import zipfile
+
+import attr
+
+
+TRIAL_PATCH_DIR = pathlib.Path(__file__).parent / "scripts" / "checkon_trial"
+
+
+@attr.dataclass(frozen=True)
+class Wheelhouse:
+    path: pathlib.Path
+    inject: str
+    inject_wheel: pathlib.Path
+    inject_digest: str
+    trial_patch_wheel: pathlib.Path
+    trial_patch_digest: str
+
+    @classmethod
+    def build(cls, inject: str, path: pathlib.Path):
+        """Build ``inject`` and the trial patch into a wheelhouse at ``path``.
+
+        Only those two are built; their dependencies still come from the index, so the
+        wheelhouse stays usable by envs on other Python versions.
+        """
+        inject_wheel = build_wheel(inject, path)
+        # The trial patch ships with checkon, so envs get the reporter this
+        # version of checkon reads. Build a copy, since pip builds in the source tree.
+        with tempfile.TemporaryDirectory() as tmp:
+            source = pathlib.Path(tmp) / TRIAL_PATCH_DIR.name
+            shutil.copytree(TRIAL_PATCH_DIR, source)
+            trial_patch_wheel = build_wheel(str(source), path)
+        return cls(
+            path=path,
+            inject=inject,
+            inject_wheel=inject_wheel,
+            inject_digest=wheel_digest(inject_wheel),
+            trial_patch_wheel=trial_patch_wheel,
+            trial_patch_digest=source_digest(TRIAL_PATCH_DIR),
+        )
+
+    @classmethod
+    @contextlib.contextmanager
+    def temporary(cls, inject: str) -> t.Iterator["Wheelhouse"]:
+        """`build` into a temporary directory, removed on leaving the context."""
+        with tempfile.TemporaryDirectory(prefix="checkon-wheelhouse-") as tmp:
+            yield cls.build(inject, pathlib.Path(tmp))
+
+    def install_command(
+        self, requirement: t.Union[str, pathlib.Path], *options: str
+    ) -> t.List[str]:
+        return [
+            "python",
+            "-m",
+            "pip",
+            "install",
+            *options,
+            "--find-links",
+            str(self.path),
+            str(requirement),
+        ]
+
+    def inject_command(self) -> t.List[str]:
+        return self.install_command(self.inject_wheel, "--force")
+
+    def trial_patch_command(self) -> t.List[str]:
+        return self.install_command(self.trial_patch_wheel, "--force")
+
+
+def build_wheel(requirement: str, path: pathlib.Path) -> pathlib.Path:
+    """Build ``requirement`` into ``path`` and return its wheel."""
+    # Build on its own first to learn the name of the wheel.
+    with tempfile.TemporaryDirectory(dir=path) as build_dir:
+        pip_wheel(requirement, pathlib.Path(build_dir))
+        [wheel] = pathlib.Path(build_dir).glob("*.whl")
+        return wheel.rename(path / wheel.name)
+
+
+def wheel_digest(path: pathlib.Path) -> str:
+    """Digest the files in a wheel, which stay the same when it is rebuilt.
+
+    The zip timestamps and ``RECORD`` are left out, since wheels embed build times.
+    """
+    digest = hashlib.sha256()
+    with zipfile.ZipFile(path) as wheel:
+        for name in sorted(wheel.namelist()):
+            if name.endswith(".dist-info/RECORD"):
+                continue
+            digest.update(name.encode() + b"\0")
+            digest.update(wheel.read(name))
+    return digest.hexdigest()
+
+
+def source_digest(path: pathlib.Path) -> str:
+    """Digest the Python sources under ``path``; wheels of them embed build times."""
+    digest = hashlib.sha256()
+    for source in sorted(path.rglob("*.py")):
+        digest.update(str(source.relative_to(path)).encode() + b"\0")
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def pip_wheel(requirement: str, wheel_dir: pathlib.Path):
+    subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pip",
+            "wheel",
+            "--no-deps",
+            "--wheel-dir",
+            str(wheel_dir),
+            requirement,
+        ],
+        check=True,
+    )
@@ -0,0 +1,52 @@
+import datetime
+
+import pytest
+
+import checkon.results
+
+
+def build_run(url, failures):
+    """An `AppSuiteRun` of one env of ten tests, the first ``failures`` failing."""
+    test_cases = [
+        checkon.results.TestCaseRun(
+            name=f"test_{i}",
+            classname="tests.test_mod",
+            file="tests/test_mod.py",
+            line=i,
+            time=0.001,
+            failure=(
+                checkon.results.Failure(message=f"assert {i}", text="")
+                if i < failures
+                else None
+            ),
+        )
+        for i in range(10)
+    ]
+    suite = checkon.results.TestSuiteRun(
+        errors=0,
+        failures=failures,
+        skipped=0,
+        tests=len(test_cases),
+        time="1.0",
+        timestamp=datetime.datetime(2019, 9, 11),
+        hostname="test",
+        name="pytest",
+        test_cases=test_cases,
+        envname="py37",
+    )
+    return checkon.results.AppSuiteRun(
+        injected="provider==1.0",
+        dependent_result=checkon.results.DependentResult(
+            url=url,
+            suite_runs=[
+                checkon.results.ToxTestSuiteRun(
+                    suite=suite, tox_run=None, envname="py37"
+                )
+            ],
+        ),
+    )
+
+
+@pytest.fixture
+def make_run():
+    return build_run
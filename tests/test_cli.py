@@ -0,0 +1,35 @@
+import click.testing
+
+import checkon.app
+import checkon.cli
+
+
+def test_test_command_runs_dependents(monkeypatch, make_run):
+    calls = []
+
+    def run_many(project_urls, **kw):
+        calls.append((project_urls, kw))
+        return {url: make_run(url, failures=1) for url in project_urls}
+
+    monkeypatch.setattr(checkon.app, "run_many", run_many)
+
+    result = click.testing.CliRunner().invoke(
+        checkon.cli.cli,
+        ["test", "--inject", "attrs", "--hide-passed", "dependents", "https://a"],
+    )
+
+    assert result.exit_code == 0, result.output
+    [(project_urls, kw)] = calls
+    assert project_urls == ["https://a"]
+    assert kw["inject"] == "attrs"
+    assert "test_0" in result.output
+    assert "test_1" not in result.output
+
+
+def test_db_option_refuses_other_databases():
+    result = click.testing.CliRunner().invoke(
+        checkon.cli.cli, ["history", "pass-rate", "--db", "postgresql://localhost/x"]
+    )
+
+    assert result.exit_code == 2
+    assert "Not a SQLite database" in result.output
@@ -0,0 +1,51 @@
+import pytest
+
+import checkon.export
+import checkon.satests
+
+
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def test_export_appends_only_new_runs(tmp_path, make_run):
+    db = checkon.satests.Database.from_string("sqlite:///:memory:")
+    db.init()
+    output_dir = tmp_path / "export"
+    checkon.satests.insert_result(db, make_run("https://example.com/a", 2))
+
+    assert checkon.export.export(db, output_dir) == (1, 10)
+    checkon.satests.insert_result(db, make_run("https://example.com/b", 3))
+    assert checkon.export.export(db, output_dir) == (1, 10)
+    assert checkon.export.export(db, output_dir) == (0, 0)
+
+    table = pq.read_table(str(output_dir)).to_pydict()
+    assert sorted(set(table["application"])) == [
+        "https://example.com/a",
+        "https://example.com/b",
+    ]
+    assert sum(table["failed"]) == 5
+    assert set(table["date"]) == {"2019-09-11"}
+
+
+def test_export_interrupted_before_recording_writes_no_rows_twice(
+    tmp_path, make_run, monkeypatch
+):
+    db = checkon.satests.Database.from_string("sqlite:///:memory:")
+    db.init()
+    output_dir = tmp_path / "export"
+    checkon.satests.insert_result(db, make_run("https://example.com/a", 2))
+
+    class Crash(Exception):
+        pass
+
+    def crash(output_dir, tox_run_id):
+        raise Crash
+
+    with monkeypatch.context() as patch:
+        patch.setattr(checkon.export, "record_exported", crash)
+        with pytest.raises(Crash):
+            checkon.export.export(db, output_dir)
+    checkon.satests.insert_result(db, make_run("https://example.com/a", 3))
+    assert checkon.export.export(db, output_dir) == (2, 20)
+
+    assert pq.read_table(str(output_dir)).num_rows == 20
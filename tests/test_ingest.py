@@ -0,0 +1,47 @@
+import concurrent.futures
+
+import checkon.app
+import checkon.ingest
+import checkon.journal
+import checkon.satests
+
+
+def test_ingester_inserts_runs_put_from_many_threads(make_run):
+    db = checkon.satests.Database.from_string("sqlite:///:memory:")
+    db.init()
+    runs = [make_run(f"https://example.com/{i}", i % 4) for i in range(40)]
+
+    with checkon.ingest.Ingester(db, max_batch_runs=8) as ingester:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(ingester.put, runs))
+        tox_run_ids = [ingester.tox_run_id(run) for run in runs]
+
+    assert len(set(tox_run_ids)) == len(runs)
+    assert ingester.stats.runs == len(runs)
+    for run, tox_run_id in zip(runs, tox_run_ids):
+        [application] = db.engine.execute(
+            "SELECT application FROM tox_run WHERE tox_run_id = ?", tox_run_id
+        ).fetchone()
+        assert application == run.dependent_result.url
+    failures = db.engine.execute("SELECT count(*) FROM test_failure").scalar()
+    assert failures == sum(i % 4 for i in range(40))
+
+
+def test_runs_replayed_from_the_journal_are_not_inserted_again(tmp_path, make_run):
+    db = checkon.satests.Database.from_string(f"sqlite:///{tmp_path / 'runs.db'}")
+    db.init()
+    journal_path = tmp_path / "journal.jsonl"
+    run = make_run("https://example.com/a", 2)
+
+    with checkon.ingest.Ingester(db) as ingester:
+        run_journal = checkon.journal.Journal.open(journal_path)
+        checkon.app.ingest_run(ingester, run_journal, run, "rev", "inject", False)
+        tox_run_id = ingester.tox_run_id(run)
+    # Resumed, with every env copied from the journal.
+    replayed = make_run("https://example.com/a", 2)
+    with checkon.ingest.Ingester(db) as ingester:
+        run_journal = checkon.journal.Journal.open(journal_path)
+        checkon.app.ingest_run(ingester, run_journal, replayed, "rev", "inject", True)
+        assert ingester.tox_run_id(replayed) == tox_run_id
+
+    assert db.engine.execute("SELECT count(*) FROM tox_run").scalar() == 1
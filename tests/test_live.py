@@ -0,0 +1,90 @@
+import importlib.util
+import json
+import types
+
+import checkon.app
+import checkon.live
+
+
+def failure_line(nodeid, message="assert 0"):
+    return json.dumps({"nodeid": nodeid, "when": "call", "message": message}) + "\n"
+
+
+def write_failures(results_dir, envname, count):
+    (results_dir / envname).mkdir(parents=True)
+    with open(results_dir / envname / f"live_{envname}.jsonl", "a") as f:
+        for i in range(count):
+            f.write(failure_line(f"tests/test_x.py::test_{i}"))
+
+
+def test_json_lines_tail_waits_for_a_line_to_be_complete(tmp_path):
+    path = tmp_path / "py37" / "live_py37.jsonl"
+    path.parent.mkdir()
+    line = failure_line("tests/test_x.py::test_b")
+    path.write_text(failure_line("tests/test_x.py::test_a") + line[:10])
+    tail = checkon.live.JsonLinesTail(path)
+
+    assert [failure.test_id for failure in tail.poll()] == ["tests/test_x.py::test_a"]
+    assert tail.poll() == []
+    with open(path, "a") as f:
+        f.write(line[10:])
+    [failure] = tail.poll()
+    assert failure == checkon.live.LiveFailure(
+        envname="py37", test_id="tests/test_x.py::test_b", message="assert 0"
+    )
+
+
+def test_follower_aborts_once_the_dependent_is_out_of_failures(tmp_path):
+    follower = checkon.live.Follower(
+        "https://a", tmp_path, checkon.live.FailureBudget(limit=3)
+    )
+    write_failures(tmp_path, "py37", 2)
+
+    assert follower() is None
+    write_failures(tmp_path, "py38", 1)
+    assert follower() == "failures"
+    assert follower.budget.spent == 3
+
+
+def test_run_budget_aborts_the_other_dependents(tmp_path):
+    run_budget = checkon.live.FailureBudget(limit=2)
+    failing, other = [
+        checkon.live.Follower(
+            url, tmp_path / url, checkon.live.FailureBudget(parent=run_budget)
+        )
+        for url in ["a", "b"]
+    ]
+    write_failures(tmp_path / "a", "py37", 2)
+    (tmp_path / "b").mkdir()
+
+    assert not other.exhausted
+    assert failing() == "failures"
+    # Its remaining envs are skipped, and the running ones killed.
+    assert other.exhausted
+    assert other() == "failures"
+
+
+def load_plugin():
+    path = checkon.app.PYTEST_PLUGIN_DIR / "checkon_live.py"
+    spec = importlib.util.spec_from_file_location("checkon_live", path)
+    plugin = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(plugin)
+    return plugin
+
+
+def test_live_plugin_appends_failures(tmp_path, monkeypatch):
+    plugin = load_plugin()
+    path = tmp_path / "live_py37.jsonl"
+    monkeypatch.setenv("CHECKON_LIVE", str(path))
+    crash = types.SimpleNamespace(reprcrash=types.SimpleNamespace(message="assert 0"))
+
+    for nodeid, failed in [("test_a", False), ("test_b", True)]:
+        plugin.pytest_runtest_logreport(
+            types.SimpleNamespace(
+                nodeid=nodeid, when="call", failed=failed, longrepr=crash
+            )
+        )
+
+    assert [json.loads(line) for line in path.read_text().splitlines()] == [
+        {"nodeid": "test_b", "when": "call", "message": "assert 0"}
+    ]
@@ -0,0 +1,182 @@
+import datetime
+import io
+import json
+
+import pytest
+
+import checkon.app
+import checkon.live
+import checkon.results
+
+
+JUNIT = b"""<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+<testsuite errors="2" failures="1" hostname="h" name="pytest" skipped="1" tests="5"
+    time="0.1" timestamp="2019-09-11T22:33:25.000000">
+<testcase classname="tests.test_x" file="tests/test_x.py" line="1" name="test_ok"
+    time="0.001"/>
+<testcase classname="tests.test_x" file="tests/test_x.py" line="3" name="test_fail"
+    time="0.001"><failure message="assert 0">assert 0</failure></testcase>
+<testcase classname="tests.test_x" file="tests/test_x.py" line="5" name="test_setup"
+    time="0.001"><error message="error at setup of test_setup">fixture 'nope' not
+found</error></testcase>
+<testcase classname="tests.test_x" file="tests/test_x.py" line="7" name="test_teardown"
+    time="0.001"><error message="failed on teardown with &quot;boom&quot;">boom</error>
+</testcase>
+<testcase classname="tests.test_x" file="tests/test_x.py" line="9" name="test_skip"
+    time="0.001"><skipped message="skipped" type="pytest.skip">why</skipped></testcase>
+</testsuite>
+</testsuites>
+"""
+
+
+def test_junit_errors_are_failures_and_skips_are_not():
+    cases = {
+        case.name: case for case in checkon.results.iter_test_cases(io.BytesIO(JUNIT))
+    }
+
+    assert cases["test_ok"].failure is None
+    assert cases["test_skip"].failure is None
+    assert cases["test_fail"].failure.message == "assert 0"
+    assert cases["test_setup"].failure.message == "error at setup of test_setup"
+    assert cases["test_setup"].failure.text == "fixture 'nope' not\nfound"
+    assert cases["test_teardown"].failure.message == 'failed on teardown with "boom"'
+
+
+def test_dependent_results_parsed_in_a_pool_are_those_parsed_serially(tmp_path):
+    for envname in ["py36", "py37", "py38"]:
+        (tmp_path / envname).mkdir()
+        (tmp_path / envname / f"test_{envname}.xml").write_bytes(JUNIT)
+        (tmp_path / envname / f"tox_{envname}.json").write_text(
+            json.dumps(
+                {
+                    "reportversion": "1",
+                    "toxversion": "3.14.0",
+                    "platform": "linux",
+                    "host": "localhost",
+                    "commands": [],
+                    "testenvs": {},
+                }
+            )
+        )
+
+    def load(jobs):
+        # Parse again, rather than load what the other call cached.
+        for path in tmp_path.glob(f"*/{checkon.results.CACHE_NAME}"):
+            path.unlink()
+        return checkon.results.DependentResult.from_dir(tmp_path, "u", jobs=jobs)
+
+    pooled = load(jobs=2)
+    assert len(pooled.suite_runs) == 3
+    assert pooled == load(jobs=1)
+
+
+XUNIT2 = b"""<?xml version="1.0" encoding="utf-8"?>
+<testsuites>
+<testsuite errors="0" failures="2" hostname="h" name="pytest" skipped="0" tests="3"
+    time="0.1" timestamp="2019-09-11T22:33:25.000000">
+<testcase classname="tests.test_x" name="test_ok" time="0.001"/>
+<testcase classname="tests.test_x" name="test_fail" time="0.001"><failure
+    message="assert 0">assert 0</failure></testcase>
+<testcase classname="tests.unit.test_y.TestK" name="test_fail[1]" time="0.001"><failure
+    message="assert 1">assert 1</failure></testcase>
+</testsuite>
+</testsuites>
+"""
+
+
+def test_failed_node_ids_of_xunit2_report():
+    [suite] = checkon.results.TestSuiteRun.from_bytes(XUNIT2, "py37")
+    result = checkon.results.DependentResult(
+        url="https://example.com/a",
+        suite_runs=[
+            checkon.results.ToxTestSuiteRun(suite=suite, tox_run=None, envname="py37")
+        ],
+    )
+
+    assert checkon.app.failed_node_ids(result) == {
+        "py37": [
+            "tests/test_x.py::test_fail",
+            "tests/unit/test_y.py::TestK::test_fail[1]",
+        ]
+    }
+
+
+def subunit_stream(status="fail", traceback=b"Traceback\nAssertionError: boom\n"):
+    subunit = pytest.importorskip("subunit")
+    start = datetime.datetime(2019, 9, 11, 22, 33, 25, 123456, datetime.timezone.utc)
+    out = io.BytesIO()
+    stream = subunit.StreamResultToBytes(out)
+    stream.status(test_id="tests.test_x.Test.test_ok", test_status="success")
+    stream.status(
+        test_id="tests.test_x.Test.test_bad", test_status="inprogress", timestamp=start
+    )
+    stream.status(
+        test_id="tests.test_x.Test.test_bad",
+        file_name="traceback",
+        file_bytes=traceback,
+        mime_type="text/x-traceback; charset=utf8",
+        eof=True,
+    )
+    stream.status(
+        test_id="tests.test_x.Test.test_bad",
+        test_status=status,
+        timestamp=start + datetime.timedelta(seconds=2),
+    )
+    return out.getvalue()
+
+
+def test_subunit_round_trip():
+    # Long enough for multi-byte lengths.
+    traceback = b"Traceback\n" + b"  x\n" * 5000 + b"AssertionError: boom\n"
+    data = subunit_stream(traceback=traceback)
+
+    packets = list(checkon.results.iter_subunit(io.BytesIO(data)))
+    cases = [case for case, _ in checkon.results.iter_subunit_cases(packets)]
+
+    assert [packet.status for packet in packets] == [
+        "success",
+        "inprogress",
+        None,
+        "fail",
+    ]
+    assert packets[1].timestamp == datetime.datetime(
+        2019, 9, 11, 22, 33, 25, 123456, datetime.timezone.utc
+    )
+    assert packets[2].file_name == "traceback"
+    assert packets[2].file_bytes == traceback
+    [ok, bad] = cases
+    assert (ok.classname, ok.name, ok.failure) == ("tests.test_x.Test", "test_ok", None)
+    assert bad.time == 2.0
+    assert bad.failure.message == "AssertionError: boom"
+    assert bad.failure.text == traceback.decode()
+
+
+def test_subunit_skips_packets_failing_their_checksum():
+    data = bytearray(subunit_stream())
+    stream = io.BytesIO(bytes(data))
+    next(checkon.results.iter_subunit(stream))
+    # Corrupt the checksum of the first packet, which was read up to it.
+    data[stream.tell() - 1] ^= 0xFF
+
+    packets = list(checkon.results.iter_subunit(io.BytesIO(bytes(data))))
+
+    assert [packet.status for packet in packets] == ["inprogress", None, "fail"]
+
+
+def test_subunit_leaves_a_packet_cut_short_for_the_next_read(tmp_path):
+    data = subunit_stream()
+    path = tmp_path / "py37" / "test_py37.subunit"
+    path.parent.mkdir()
+    tail = checkon.live.SubunitTail(path)
+
+    # Cut in the middle of the failing status packet.
+    path.write_bytes(data[:-5])
+    assert tail.poll() == []
+    with open(path, "ab") as f:
+        f.write(data[-5:])
+    [failure] = tail.poll()
+
+    assert failure.test_id == "tests.test_x.Test.test_bad"
+    assert failure.message == "AssertionError: boom"
+    assert tail.poll() == []
@@ -0,0 +1,126 @@
+import concurrent.futures
+
+import checkon.app
+import checkon.satests
+
+
+def test_compare_query_uses_indexes():
+    db = checkon.satests.Database.from_string("sqlite:///:memory:")
+    db.init()
+
+    plan = [
+        row[-1]
+        for row in db.engine.execute(
+            checkon.app.report_query("EXPLAIN QUERY PLAN "), tox_run_ids=[1, 2]
+        )
+    ]
+
+    # The report starts from its runs and looks everything else up by index.
+    assert plan[0].startswith("SEARCH tr ")
+    assert not [step for step in plan if step.startswith("SCAN")]
+    assert not [step for step in plan if "AUTOMATIC" in step]
+    assert any(step.startswith("SEARCH tcr USING INDEX") for step in plan)
+
+
+def test_changes_query_looks_up_base_runs_by_index():
+    db = checkon.satests.Database.from_string("sqlite:///:memory:")
+    db.init()
+
+    plan = [
+        row[-1]
+        for row in db.engine.execute(
+            checkon.app.changes_report_query("EXPLAIN QUERY PLAN "),
+            base_tox_run_ids=[1],
+            new_tox_run_ids=[2],
+        )
+    ]
+
+    assert not [step for step in plan if step.startswith("SCAN")]
+    assert any(
+        step.startswith("SEARCH btcr USING INDEX ix_test_case_run_suite_case")
+        for step in plan
+    )
+
+
+def schema(engine):
+    """The indexes of ``engine``'s database, and the columns of each table."""
+    indexes = {
+        tuple(row)
+        for row in engine.execute(
+            "SELECT name, tbl_name, sql FROM sqlite_master WHERE type = 'index'"
+        )
+    }
+    tables = engine.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    columns = {
+        table: {row[1] for row in engine.execute(f"PRAGMA table_info({table})")}
+        for [table] in tables.fetchall()
+    }
+    return indexes, columns
+
+
+def test_init_migrates_unversioned_database(tmp_path):
+    fresh = checkon.satests.Database.from_string(f"sqlite:///{tmp_path / 'new.db'}")
+    fresh.init()
+    db = checkon.satests.Database.from_string(f"sqlite:///{tmp_path / 'old.db'}")
+    db.init()
+    assert checkon.satests.schema_version(db.engine) == len(checkon.satests.MIGRATIONS)
+    # Go back to the schema from before versions, which had no indexes.
+    for [name] in db.engine.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'index' AND sql IS NOT NULL"
+    ).fetchall():
+        db.engine.execute(f"DROP INDEX {name}")
+    db.engine.execute("ALTER TABLE tox_run DROP COLUMN start_time")
+    db.engine.execute("ALTER TABLE failure_output DROP COLUMN digest")
+    db.engine.execute("PRAGMA user_version = 0")
+    # It stored a test case again for each run.
+    for test_case_id in [1, 2]:
+        db.engine.execute(
+            "INSERT INTO test_case VALUES ('test_a', 'tests.test_a', NULL, 1, ?)",
+            test_case_id,
+        )
+        db.engine.execute(
+            "INSERT INTO test_case_run (test_case_run_id, test_case_id) VALUES (?, ?)",
+            test_case_id,
+            test_case_id,
+        )
+
+    db.init()
+
+    assert schema(db.engine) == schema(fresh.engine)
+    assert checkon.satests.schema_version(db.engine) == len(checkon.satests.MIGRATIONS)
+    assert db.engine.execute("SELECT test_case_id FROM test_case").fetchall() == [(1,)]
+    assert db.engine.execute("SELECT test_case_id FROM test_case_run").fetchall() == [
+        (1,),
+        (1,),
+    ]
+
+
+def test_concurrent_writers_allocate_distinct_ids(tmp_path, make_run):
+    url = f"sqlite:///{tmp_path / 'shared.db'}"
+    checkon.satests.Database.from_string(url).init()
+
+    def insert(writer):
+        # A database of its own, as another process would have.
+        db = checkon.satests.Database.from_string(url)
+        for i in range(10):
+            checkon.satests.insert_result(db, make_run(f"https://e/{writer}/{i}", 1))
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(insert, range(4)))
+
+    db = checkon.satests.Database.from_string(url)
+    assert db.engine.execute("SELECT count(*) FROM tox_run").scalar() == 40
+
+
+def test_inserting_a_result_again_reuses_its_test_cases(make_run):
+    db = checkon.satests.Database.from_string("sqlite:///:memory:")
+    db.init()
+    run = make_run("https://example.com/a", 2)
+
+    checkon.satests.insert_result(db, run)
+    # Not from the cache, as from another process.
+    db._cache.clear()
+    checkon.satests.insert_result(db, run)
+
+    assert db.engine.execute("SELECT count(*) FROM test_case").scalar() == 10
+    assert db.engine.execute("SELECT count(*) FROM test_case_run").scalar() == 20
@@ -0,0 +1,43 @@
+import json
+
+import attr
+
+import checkon.tox
+
+
+TESTENV = {
+    "setup": [],
+    "python": {
+        "executable": "/env/bin/python",
+        "name": "python",
+        "version_info": [3, 7, 4, "final", 0],
+        "version": "3.7.4",
+        "is_64": True,
+        "sysplatform": "linux",
+    },
+    "installed_packages": ["attrs==19.1.0"],
+    "test": [{"command": ["pytest"], "output": "", "retcode": 0}],
+}
+
+
+def test_evolved_tox_run_keeps_its_testenvs(tmp_path):
+    path = tmp_path / "tox_py37.json"
+    path.write_text(
+        json.dumps(
+            {
+                "reportversion": "1",
+                "toxversion": "3.14.0",
+                "platform": "linux",
+                "host": "localhost",
+                "commands": [],
+                "testenvs": {"py37": TESTENV},
+            }
+        )
+    )
+    tox_run = checkon.tox.ToxRun.from_path(path)
+
+    evolved = attr.evolve(tox_run, host="elsewhere")
+
+    assert evolved.testenvs is tox_run.testenvs
+    assert list(evolved.testenvs) == ["py37"]
+    assert evolved.testenvs["py37"].installed_packages == ["attrs==19.1.0"]
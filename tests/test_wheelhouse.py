@@ -0,0 +1,32 @@
+import checkon.wheelhouse
+
+
+def test_inject_digest_is_stable_across_builds(tmp_path, monkeypatch):
+    source = tmp_path / "inject"
+    (source / "inject").mkdir(parents=True)
+    (source / "inject" / "__init__.py").write_text("VERSION = 1\n")
+    (source / "setup.py").write_text(
+        "from setuptools import setup\n"
+        "setup(name='inject', version='1.0', packages=['inject'])\n"
+    )
+
+    wheels = []
+    # Wheels take their zip timestamps from this, as from the clock otherwise.
+    for epoch in ["1600000000", "1700000000"]:
+        monkeypatch.setenv("SOURCE_DATE_EPOCH", epoch)
+        build_dir = tmp_path / epoch
+        build_dir.mkdir()
+        wheels.append(checkon.wheelhouse.build_wheel(str(source), build_dir))
+
+    [first, second] = wheels
+    assert first.read_bytes() != second.read_bytes()
+    assert checkon.wheelhouse.wheel_digest(first) == checkon.wheelhouse.wheel_digest(
+        second
+    )
+
+    (source / "inject" / "__init__.py").write_text("VERSION = 2\n")
+    (tmp_path / "changed").mkdir()
+    changed = checkon.wheelhouse.build_wheel(str(source), tmp_path / "changed")
+    assert checkon.wheelhouse.wheel_digest(changed) != checkon.wheelhouse.wheel_digest(
+        first
+    )